@@ -0,0 +1,151 @@
+import asyncio
+import threading
+import time
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-item requests into batched handler calls.
+
+    ``submit`` queues an item and waits for its result. A background task
+    collects queued items until ``max_batch_size`` is reached or the oldest
+    item has waited ``max_wait_ms``, then runs ``handler(items)`` once in
+    ``executor`` (the default thread pool when None) and hands result ``i``
+    back to caller ``i``. The handler must return one result per item, in
+    order; a result that is an Exception is raised in that caller only.
+
+    When disabled or not started, ``submit`` runs the handler on its own item.
+    """
+
+    def __init__(self, name: str, handler, max_batch_size: int = 32, max_wait_ms: float = 2.0,
+                 max_in_flight: int = 1, executor=None, enabled: bool = True):
+        self.name = name
+        self.handler = handler
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_in_flight = max(1, max_in_flight)
+        self.executor = executor
+        self.enabled = enabled
+        self._queue = None
+        self._worker = None
+        self._slots = None
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.batches = 0
+        self.items = 0
+        self.failed_batches = 0
+        self.queue_wait_seconds = 0.0
+        # batch size -> [batch count, total handler seconds]
+        self.by_size = {}
+
+    async def start(self):
+        if not self.enabled or self._worker is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._worker = asyncio.create_task(self._run(), name=f"micro-batcher-{self.name}")
+
+    async def stop(self):
+        """Flush everything already queued, then stop the collector task."""
+        if self._worker is None:
+            return
+        await self._queue.join()
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    async def submit(self, item):
+        if self._worker is None:
+            return (await self._call([item]))[0]
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _call(self, items):
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(self.executor, self.handler, items)
+        if len(results) != len(items):
+            raise RuntimeError(f"{self.name} handler returned {len(results)} results for {len(items)} items")
+        for result in results:
+            if isinstance(result, Exception) and len(items) == 1:
+                raise result
+        return results
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._slots.acquire()
+            asyncio.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        items = [item for item, _, _ in batch]
+        dispatched_at = time.perf_counter()
+        try:
+            results = await self._call(items)
+        except Exception as e:
+            results = None
+            error = e
+        elapsed = time.perf_counter() - dispatched_at
+        try:
+            for i, (_, future, _) in enumerate(batch):
+                if future.done():
+                    continue
+                if results is None:
+                    future.set_exception(error)
+                elif isinstance(results[i], Exception):
+                    future.set_exception(results[i])
+                else:
+                    future.set_result(results[i])
+            self._record(batch, dispatched_at, elapsed, results is None)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+            self._slots.release()
+
+    def _record(self, batch, dispatched_at, elapsed, failed):
+        with self._stats_lock:
+            self.batches += 1
+            self.items += len(batch)
+            self.failed_batches += int(failed)
+            self.queue_wait_seconds += sum(dispatched_at - queued_at for _, _, queued_at in batch)
+            entry = self.by_size.setdefault(len(batch), [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "enabled": self.enabled,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+                "batches": self.batches,
+                "items": self.items,
+                "failed_batches": self.failed_batches,
+                "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "mean_queue_wait_ms": round(self.queue_wait_seconds / self.items * 1000, 3) if self.items else 0.0,
+                "by_batch_size": {
+                    size: {"batches": count, "mean_handler_ms": round(total / count * 1000, 3)}
+                    for size, (count, total) in sorted(self.by_size.items())
+                },
+            }
@@ -0,0 +1,99 @@
+"""Helpers shared by the benchmark scripts: latency summaries, result files and run-to-run comparison."""
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Fields compared between runs, and whether a larger value is better
+COMPARED_FIELDS = {"p50_ms": False, "p95_ms": False, "p99_ms": False, "throughput_per_sec": True,
+                   "updates_per_sec": True}
+
+
+def summarize(samples, elapsed: float = None):
+    """Latency summary (ms) of per-call durations in seconds; throughput uses ``elapsed`` wall time if given."""
+    if not samples:
+        return {"count": 0}
+    ms = np.asarray(samples) * 1e3
+    total = elapsed if elapsed is not None else float(np.sum(samples))
+    return {
+        "count": len(samples),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+        "throughput_per_sec": round(len(samples) / total, 1) if total > 0 else None,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def environment():
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def save_results(path: str, report: dict):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {path}", file=sys.stderr)
+
+
+def compare(current: dict, baseline: dict):
+    """Relative change of each compared field for the cases present in both result sets."""
+    changes = {}
+    for case, stats in current.items():
+        before = baseline.get(case)
+        if not isinstance(stats, dict) or not isinstance(before, dict):
+            continue
+        for field, higher_is_better in COMPARED_FIELDS.items():
+            new, old = stats.get(field), before.get(field)
+            if not new or not old:
+                continue
+            change = (new - old) / old * 100
+            improved = change > 0 if higher_is_better else change < 0
+            changes.setdefault(case, {})[field] = {
+                "baseline": old, "current": new, "change_pct": round(change, 1), "improved": improved
+            }
+    return changes
+
+
+def print_comparison(changes: dict):
+    for case, fields in changes.items():
+        print(f"{case}:")
+        for field, delta in fields.items():
+            marker = "=" if delta["change_pct"] == 0 else "+" if delta["improved"] else "-"
+            print(f"  [{marker}] {field:<20} {delta['baseline']:>12} -> {delta['current']:>12} ({delta['change_pct']:+.1f}%)")
+
+
+def finish(report: dict, output: str = None, baseline: str = None):
+    """Print the report, optionally save it, and compare it with a previous result file."""
+    print(json.dumps(report, indent=2))
+    if output:
+        save_results(output, report)
+    if baseline:
+        with open(baseline) as f:
+            previous = json.load(f)
+        changes = compare(report.get("results", {}), previous.get("results", {}))
+        report["comparison"] = changes
+        print_comparison(changes)
+        if output:
+            save_results(output, report)
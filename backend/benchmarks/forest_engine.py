@@ -0,0 +1,95 @@
+"""Parity check and latency benchmark: FlatForest vs sklearn predict_proba.
+
+Run from backend/:  python -m benchmarks.forest_engine [--rows 10000] [--repeat 500]
+Exits non-zero if the two backends disagree beyond --atol.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+
+from feature_encoder import FeatureEncoder, CATEGORICAL_FIELDS
+from forest_engine import FlatForest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIR = os.path.join(BASE_DIR, "model")
+
+
+def synthetic_records(encoder, n, seed=0):
+    rng = np.random.default_rng(seed)
+    levels = {field: list(values) + ["NA"] for field, values in encoder.category_index.items()}
+    records = []
+    for _ in range(n):
+        record = {field: levels[field][rng.integers(len(levels[field]))] for field in CATEGORICAL_FIELDS}
+        record["Past_Return_Count"] = int(rng.integers(0, 10))
+        record["Product_Rating"] = float(rng.integers(2, 11) / 2)
+        record["Delivery_Time_Days"] = int(rng.integers(1, 15))
+        records.append(record)
+    return records
+
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1e6
+    return {f"p{q}": round(float(np.percentile(samples, q)), 1) for q in (50, 95, 99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="synthetic rows for parity and batch timing")
+    parser.add_argument("--repeat", type=int, default=500, help="single-row calls to time per backend")
+    parser.add_argument("--atol", type=float, default=1e-9)
+    args = parser.parse_args()
+
+    model = joblib.load(os.path.join(MODEL_DIR, "trained_model.pkl"))
+    with open(os.path.join(MODEL_DIR, "input_columns.json")) as f:
+        columns = json.load(f)
+    if hasattr(model, "feature_names_in_"):
+        del model.feature_names_in_
+
+    encoder = FeatureEncoder(columns)
+    X = encoder.encode_many(synthetic_records(encoder, args.rows))
+
+    start = time.perf_counter()
+    flat = FlatForest(model)
+    compile_ms = (time.perf_counter() - start) * 1e3
+
+    # Parity
+    max_diff = float(np.max(np.abs(flat.predict_proba(X) - model.predict_proba(X))))
+    parity_ok = max_diff <= args.atol
+
+    # Single-row latency
+    single = {}
+    for name, fn in (("sklearn", model.predict_proba), ("flat", flat.predict_proba)):
+        timings = []
+        for i in range(args.repeat):
+            row = X[i % len(X)].reshape(1, -1)
+            start = time.perf_counter()
+            fn(row)
+            timings.append(time.perf_counter() - start)
+        single[name] = percentiles(timings)
+
+    # Batch throughput
+    batch = {}
+    for name, fn in (("sklearn", model.predict_proba), ("flat", flat.predict_proba)):
+        start = time.perf_counter()
+        fn(X)
+        batch[name] = round(len(X) / (time.perf_counter() - start))
+
+    report = {
+        "trees": len(model.estimators_),
+        "nodes": int(flat.feature.shape[0]),
+        "compile_ms": round(compile_ms, 2),
+        "parity": {"max_abs_diff": max_diff, "atol": args.atol, "ok": parity_ok},
+        "single_row_us": single,
+        "batch_rows_per_sec": batch,
+    }
+    print(json.dumps(report, indent=2))
+    return 0 if parity_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
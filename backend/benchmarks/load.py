@@ -0,0 +1,196 @@
+"""Load generator for the API.
+
+Run from backend/:
+    python -m benchmarks.load --scenarios predict,dashboard --concurrency 32 --requests 2000 --rows 1m
+    python -m benchmarks.load --url http://127.0.0.1:8000 --scenarios mixed --duration 30
+    python -m benchmarks.load --scenarios read_write --duration 20 --rows 1m    # dashboard latency under writes
+
+Without --url the app is driven in-process through httpx's ASGI transport (the
+startup/shutdown hooks run as usual). --rows builds or reuses a synthetic
+database (see benchmarks.synthetic) and points the in-process app at it; a
+server started separately needs DATABASE_URL set to the same file.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import environment, finish, summarize
+from benchmarks.synthetic import category_levels, build_database, default_url, parse_rows
+
+SCENARIOS = {
+    # name: (method, path, body kind)
+    "predict": ("POST", "/predict-return", "order"),
+    "explain": ("POST", "/explain-return", "order"),
+    "assess": ("POST", "/assess-return", "order"),
+    "batch": ("POST", "/predict-return/batch", "orders"),
+    "dashboard": ("GET", "/dashboard-data", None),
+    "dashboard_24h": ("GET", "/dashboard-data?hours=24", None),
+    "timeseries": ("GET", "/dashboard-data/timeseries?bucket=hour&hours=168", None),
+    "predictions": ("GET", "/predictions?limit=100&region=North&fields=id,customer_region,return_probability", None),
+    "visualize": ("GET", "/visualize?format=svg", None),
+}
+# Request mix for the "mixed" scenario, roughly what the dashboard and frontend generate
+MIXED_WEIGHTS = {"assess": 5, "predict": 3, "dashboard": 1, "visualize": 1}
+# Dashboard reads while batches of predictions are being written; reported per request type
+READ_WRITE_WEIGHTS = {"batch": 1, "dashboard": 2, "timeseries": 1}
+MIXES = {"mixed": MIXED_WEIGHTS, "read_write": READ_WRITE_WEIGHTS}
+
+
+def random_order(rng: random.Random, categories):
+    order = {field: rng.choice(list(values)) for field, values in categories.items()}
+    order["Past_Return_Count"] = rng.randint(0, 9)
+    order["Product_Rating"] = rng.randint(2, 10) / 2
+    order["Delivery_Time_Days"] = rng.randint(1, 14)
+    return order
+
+
+class LoadRun:
+    def __init__(self, client, scenario, concurrency, requests, duration, batch_size, seed):
+        self.client = client
+        self.scenario = scenario
+        self.concurrency = concurrency
+        self.remaining = requests
+        self.deadline = time.perf_counter() + duration if duration else None
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.categories = category_levels()
+        self.latencies = []
+        self.by_request = {}
+        self.statuses = {}
+        self.errors = 0
+
+    def _next_request(self):
+        name = self.scenario
+        if name in MIXES:
+            weights = MIXES[name]
+            name = self.rng.choices(list(weights), weights=list(weights.values()))[0]
+        method, path, body = SCENARIOS[name]
+        if body == "order":
+            return name, method, path, random_order(self.rng, self.categories)
+        if body == "orders":
+            return name, method, path, [random_order(self.rng, self.categories) for _ in range(self.batch_size)]
+        return name, method, path, None
+
+    def _take(self):
+        if self.deadline is not None:
+            return time.perf_counter() < self.deadline
+        if self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        return True
+
+    async def _worker(self):
+        while self._take():
+            name, method, path, body = self._next_request()
+            start = time.perf_counter()
+            try:
+                response = await self.client.request(method, path, json=body)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = "error"
+            self.latencies.append(time.perf_counter() - start)
+            self.by_request.setdefault(name, []).append(self.latencies[-1])
+            self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+            if status == "error" or status >= 400:
+                self.errors += 1
+
+    async def run(self):
+        start = time.perf_counter()
+        await asyncio.gather(*(self._worker() for _ in range(self.concurrency)))
+        elapsed = time.perf_counter() - start
+        result = {**summarize(self.latencies, elapsed), "errors": self.errors, "statuses": self.statuses,
+                  "elapsed_sec": round(elapsed, 2)}
+        if self.scenario in MIXES:
+            result["by_request"] = {name: summarize(samples, elapsed) for name, samples in self.by_request.items()}
+        return result
+
+
+async def run_scenarios(client, args):
+    results = {}
+    for scenario in args.scenarios.split(","):
+        if scenario not in MIXES and scenario not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario: {scenario} (choose from {', '.join([*SCENARIOS, *MIXES])})")
+        # Short warmup so lazy initialisation isn't counted
+        await LoadRun(client, scenario, min(args.concurrency, 4), 20, None, args.batch_size, args.seed).run()
+        run = LoadRun(client, scenario, args.concurrency, args.requests, args.duration, args.batch_size, args.seed)
+        results[scenario] = await run.run()
+        r = results[scenario]
+        print(f"{scenario}: {r['throughput_per_sec']} req/s p50={r['p50_ms']}ms p95={r['p95_ms']}ms "
+              f"p99={r['p99_ms']}ms errors={r['errors']}", file=sys.stderr)
+        for name, breakdown in r.get("by_request", {}).items():
+            print(f"  {name}: p50={breakdown['p50_ms']}ms p95={breakdown['p95_ms']}ms p99={breakdown['p99_ms']}ms",
+                  file=sys.stderr)
+    return results
+
+
+async def run_in_process(args):
+    # Imported here so DATABASE_URL is already set when database.py is loaded
+    import main as api
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with api.app.router.lifespan_context(api.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=args.timeout) as client:
+            return await run_scenarios(client, args)
+
+
+async def run_against_url(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        return await run_scenarios(client, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--scenarios", default="predict", help=f"comma-separated: {', '.join([*SCENARIOS, *MIXES])}")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument("--duration", type=float, help="seconds per scenario (overrides --requests)")
+    parser.add_argument("--batch-size", type=int, default=100, help="orders per request in the batch scenario")
+    parser.add_argument("--rows", help="synthetic return_predictions size, e.g. 10k, 1m, 10m")
+    parser.add_argument("--database-url", help="database to use (default with --rows: sqlite:///./bench_<rows>.db)")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="previous JSON report to compare against")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    dataset = None
+    if args.rows:
+        rows = parse_rows(args.rows)
+        database_url = database_url or default_url(rows)
+        dataset = build_database(database_url, rows)
+    if database_url:
+        if args.url:
+            print(f"Note: --url server must be started with DATABASE_URL={database_url}", file=sys.stderr)
+        os.environ["DATABASE_URL"] = database_url
+
+    runner = run_against_url if args.url else run_in_process
+    results = asyncio.run(runner(args))
+
+    report = {
+        "benchmark": "load",
+        "environment": environment(),
+        "config": {
+            "target": args.url or "in-process",
+            "scenarios": args.scenarios,
+            "concurrency": args.concurrency,
+            "requests": None if args.duration else args.requests,
+            "duration": args.duration,
+            "database_url": database_url or "default",
+            "dataset": dataset,
+        },
+        "results": results,
+    }
+    finish(report, args.output, args.compare)
+    return 1 if any(r["errors"] for r in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
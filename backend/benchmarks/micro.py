@@ -0,0 +1,106 @@
+"""Microbenchmarks for the model, discount, chart and dashboard query code paths.
+
+Run from backend/:  python -m benchmarks.micro [--repeat 200] [--database-url sqlite:///./bench_1m.db]
+                                               [--output micro.json] [--compare previous.json]
+Cases ending in "_uncached" clear the relevant cache before every call.
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+from benchmarks.common import environment, finish, summarize
+
+SAMPLE_ORDER = {
+    "Product_Category": "Laptops",
+    "Product_Size": "M",
+    "Customer_Region": "North",
+    "Customer_Age_Group": "26-35",
+    "Past_Return_Count": 2,
+    "Product_Rating": 3.5,
+    "Delivery_Time_Days": 6,
+}
+
+
+def time_calls(fn, repeat: int, before=None, warmup: int = 3):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="calls per model/discount case")
+    parser.add_argument("--chart-repeat", type=int, default=20, help="calls per chart case")
+    parser.add_argument("--database-url", help="database for the chart and dashboard cases (default: the app database)")
+    parser.add_argument("--cases", help="comma-separated subset of cases to run")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="previous JSON report to compare against")
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    # Imported after DATABASE_URL is set, since database.py reads it at import time
+    import predict_logic
+    import visualize
+    from database import SessionLocal
+    from rollups import dashboard_summary, prediction_timeseries, utcnow
+    from services.discount_logic import calculate_discount
+
+    db = SessionLocal()
+    now = utcnow()
+
+    def timeseries(bucket, days):
+        return lambda: prediction_timeseries(db, now - datetime.timedelta(days=days), now, bucket)
+
+    cases = {
+        "make_prediction": (lambda: predict_logic.make_prediction(SAMPLE_ORDER), args.repeat, None),
+        "explain_prediction": (lambda: predict_logic.explain_prediction(SAMPLE_ORDER), args.repeat, None),
+        "explain_prediction_uncached": (
+            lambda: predict_logic.explain_prediction(SAMPLE_ORDER), args.repeat, predict_logic.explanation_cache.clear
+        ),
+        "calculate_discount": (lambda: calculate_discount(75.0, "Laptops"), args.repeat, None),
+        "stock_bar_chart": (visualize.stock_bar_chart, args.chart_repeat, None),
+        "stock_bar_chart_uncached": (visualize.stock_bar_chart, args.chart_repeat, visualize._chart_cache.clear),
+        "dashboard_summary": (lambda: dashboard_summary(db), args.repeat, None),
+        "dashboard_summary_24h": (lambda: dashboard_summary(db, since=now - datetime.timedelta(hours=24)),
+                                  args.repeat, None),
+        "timeseries_hourly_24h": (timeseries("hour", 1), args.repeat, None),
+        "timeseries_hourly_7d": (timeseries("hour", 7), args.repeat, None),
+        "timeseries_daily_90d": (timeseries("day", 90), args.repeat, None),
+    }
+    selected = args.cases.split(",") if args.cases else list(cases)
+
+    results = {}
+    for name in selected:
+        fn, repeat, before = cases[name]
+        results[name] = time_calls(fn, repeat, before)
+        print(f"{name}: p50={results[name]['p50_ms']}ms p99={results[name]['p99_ms']}ms", file=sys.stderr)
+
+    db.close()
+
+    report = {
+        "benchmark": "micro",
+        "environment": environment(),
+        "config": {
+            "repeat": args.repeat, "chart_repeat": args.chart_repeat,
+            "database_url": os.getenv("DATABASE_URL", "default"),
+            "inference_backend": predict_logic.INFERENCE_BACKEND,
+        },
+        "results": results,
+    }
+    finish(report, args.output, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
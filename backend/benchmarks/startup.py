@@ -0,0 +1,122 @@
+"""Cold-start benchmark: import-time profile of main.py and time until / and /ready answer.
+
+Run from backend/:  python -m benchmarks.startup [--runs 3] [--top 15] [--output startup.json] [--compare previous.json]
+Each run starts a fresh interpreter, so nothing is shared with earlier runs.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import BACKEND_DIR, environment, finish, summarize
+
+
+def import_profile(module: str = "main", top: int = 15):
+    """Parse ``python -X importtime`` output for ``module``; times are in milliseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, env={**os.environ, "LOG_CONSOLE": "0"},
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append((name.strip(), int(self_us) / 1e3, int(cumulative_us) / 1e3, len(name) - len(name.lstrip())))
+
+    root = next((e for e in entries if e[0] == module), None)
+    total = root[2] if root else None
+    # Direct imports of ``module`` (one indentation step below it) ranked by cumulative time
+    top_level = sorted((e for e in entries if root and e[3] == root[3] + 2), key=lambda e: -e[2])
+    return {
+        "module": module,
+        "total_ms": total,
+        "top_level_ms": {name: round(cumulative, 1) for name, _, cumulative, _ in top_level[:top]},
+        "slowest_self_ms": {
+            name: round(self_ms, 1) for name, self_ms, _, _ in sorted(entries, key=lambda e: -e[1])[:top]
+        },
+    }
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(url: str, deadline: float):
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.02)
+    return False
+
+
+def cold_start(timeout: float = 120):
+    """Seconds from launching uvicorn until ``/`` answers and until ``/ready`` returns 200."""
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env={**os.environ, "LOG_CONSOLE": "0"},
+    )
+    try:
+        deadline = started + timeout
+        base = f"http://127.0.0.1:{port}"
+        live = time.perf_counter() - started if _wait_for(f"{base}/", deadline) else None
+        ready = time.perf_counter() - started if _wait_for(f"{base}/ready", deadline) else None
+        return live, ready
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def _latency(samples):
+    stats = summarize(samples)
+    stats.pop("throughput_per_sec", None)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="cold starts to measure")
+    parser.add_argument("--top", type=int, default=15, help="modules listed in the import profile")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="previous JSON report to compare against")
+    args = parser.parse_args()
+
+    profile = import_profile("main", args.top)
+    live, ready = [], []
+    for _ in range(args.runs):
+        live_s, ready_s = cold_start(args.timeout)
+        if live_s is not None:
+            live.append(live_s)
+        if ready_s is not None:
+            ready.append(ready_s)
+
+    report = {
+        "benchmark": "startup",
+        "environment": environment(),
+        "config": {"runs": args.runs},
+        "import_profile": profile,
+        "results": {
+            "import_main": {"p50_ms": profile["total_ms"]},
+            "time_to_live": _latency(live),
+            "time_to_ready": _latency(ready),
+        },
+    }
+    finish(report, args.output, args.compare)
+    return 0 if len(ready) == args.runs else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
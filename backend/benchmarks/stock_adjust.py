@@ -0,0 +1,204 @@
+"""Throughput of POST /stocks/adjust under concurrent writers.
+
+Run from backend/:
+    python -m benchmarks.stock_adjust --skus 1000 --batch-size 500 --concurrency 8 --duration 10
+    python -m benchmarks.stock_adjust --url http://127.0.0.1:8000 --database-url sqlite:///./bench_stocks.db
+
+Seeds --skus stocks named SKU-00000... in the target database, then has
+--concurrency clients post batches of random deltas (a --hot share of them on
+the first 10 SKUs, to force row contention). Reports adjustments/sec and batch
+latency, and checks afterwards that every SKU's quantity equals its seed value
+plus the deltas of all accepted batches, i.e. that no update was lost. A server
+started separately needs DATABASE_URL set to the same database.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import environment, finish, summarize
+
+SEED_QUANTITY = 1_000_000
+HOT_SKUS = 10
+
+
+def sku_name(i: int):
+    return f"SKU-{i:05d}"
+
+
+def seed_stocks(database_url: str, skus: int):
+    from sqlalchemy import create_engine, delete
+    from sqlalchemy.orm import Session
+
+    from migrations import upgrade_schema
+    from models import Base, Stock
+
+    engine = create_engine(database_url)
+    upgrade_schema(engine, Base.metadata)
+    with Session(engine) as db:
+        db.execute(delete(Stock).where(Stock.name.like("SKU-%")))
+        db.bulk_insert_mappings(Stock, [
+            {"name": sku_name(i), "quantity": SEED_QUANTITY, "version": 0} for i in range(skus)
+        ])
+        db.commit()
+    engine.dispose()
+
+
+def read_quantities(database_url: str):
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.orm import Session
+
+    from models import Stock
+
+    engine = create_engine(database_url)
+    with Session(engine) as db:
+        rows = db.execute(select(Stock.name, Stock.quantity).where(Stock.name.like("SKU-%"))).all()
+    engine.dispose()
+    return dict(rows)
+
+
+class AdjustRun:
+    def __init__(self, client, token, skus, batch_size, concurrency, requests, duration, hot, seed):
+        self.client = client
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.skus = skus
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.remaining = requests
+        self.deadline = time.perf_counter() + duration if duration else None
+        self.hot = hot
+        self.rng = random.Random(seed)
+        self.latencies = []
+        self.statuses = {}
+        self.applied = {}
+        self.adjustments = 0
+
+    def _take(self):
+        if self.deadline is not None:
+            return time.perf_counter() < self.deadline
+        if self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        return True
+
+    def _batch(self):
+        batch = []
+        for _ in range(self.batch_size):
+            i = self.rng.randrange(min(HOT_SKUS, self.skus)) if self.rng.random() < self.hot \
+                else self.rng.randrange(self.skus)
+            batch.append({"name": sku_name(i), "delta": self.rng.choice((-3, -2, -1, 1, 2, 3))})
+        return batch
+
+    async def _worker(self):
+        while self._take():
+            batch = self._batch()
+            start = time.perf_counter()
+            try:
+                response = await self.client.post("/stocks/adjust", json={"adjustments": batch},
+                                                  headers=self.headers)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = "error"
+            self.latencies.append(time.perf_counter() - start)
+            self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+            if status == 200:
+                self.adjustments += len(batch)
+                for item in batch:
+                    self.applied[item["name"]] = self.applied.get(item["name"], 0) + item["delta"]
+
+    async def run(self):
+        start = time.perf_counter()
+        await asyncio.gather(*(self._worker() for _ in range(self.concurrency)))
+        elapsed = time.perf_counter() - start
+        return {
+            **summarize(self.latencies, elapsed),
+            "updates_per_sec": round(self.adjustments / elapsed, 1) if elapsed > 0 else None,
+            "adjustments": self.adjustments,
+            "statuses": self.statuses,
+            "elapsed_sec": round(elapsed, 2),
+        }
+
+
+async def run_benchmark(client, args):
+    response = await client.post("/token", data={"username": args.username, "password": args.password})
+    response.raise_for_status()
+    token = response.json()["access_token"]
+    # Short warmup so connection setup isn't counted (its deltas still count for the check)
+    warmup = AdjustRun(client, token, args.skus, args.batch_size, 2, 4, None, args.hot, args.seed + 1)
+    await warmup.run()
+    run = AdjustRun(client, token, args.skus, args.batch_size, args.concurrency, args.requests, args.duration,
+                    args.hot, args.seed)
+    result = await run.run()
+    applied = dict(warmup.applied)
+    for name, delta in run.applied.items():
+        applied[name] = applied.get(name, 0) + delta
+    return result, applied
+
+
+async def run_in_process(args):
+    # Imported here so DATABASE_URL is already set when database.py is loaded
+    import main as api
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with api.app.router.lifespan_context(api.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=args.timeout) as client:
+            return await run_benchmark(client, args)
+
+
+async def run_against_url(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        return await run_benchmark(client, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--database-url", default="sqlite:///./bench_stocks.db", help="database to seed and check")
+    parser.add_argument("--skus", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=500, help="adjustments per request")
+    parser.add_argument("--hot", type=float, default=0.2, help="share of adjustments on the first 10 SKUs")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="requests in total")
+    parser.add_argument("--duration", type=float, help="seconds to run (overrides --requests)")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="previous JSON report to compare against")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url
+    seed_stocks(args.database_url, args.skus)
+    runner = run_against_url if args.url else run_in_process
+    result, applied = asyncio.run(runner(args))
+
+    quantities = read_quantities(args.database_url)
+    lost = [name for name, quantity in quantities.items() if quantity != SEED_QUANTITY + applied.get(name, 0)]
+    result["mismatched_skus"] = len(lost)
+    print(f"stock_adjust: {result['updates_per_sec']} updates/s ({result['throughput_per_sec']} batches/s) "
+          f"p50={result['p50_ms']}ms p95={result['p95_ms']}ms p99={result['p99_ms']}ms "
+          f"statuses={result['statuses']}", file=sys.stderr)
+    print(f"{'❌' if lost else '✅'} {len(lost)} of {len(quantities)} SKUs differ from seed + accepted deltas",
+          file=sys.stderr)
+    report = {
+        "benchmark": "stock_adjust",
+        "environment": environment(),
+        "config": {
+            "target": args.url or "in-process", "database_url": args.database_url, "skus": args.skus,
+            "batch_size": args.batch_size, "hot": args.hot, "concurrency": args.concurrency,
+            "requests": None if args.duration else args.requests, "duration": args.duration,
+        },
+        "results": {"stock_adjust": result},
+    }
+    finish(report, args.output, args.compare)
+    return 1 if lost else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
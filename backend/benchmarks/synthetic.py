@@ -0,0 +1,141 @@
+"""Build a synthetic return_predictions database for benchmarks.
+
+Run from backend/:  python -m benchmarks.synthetic --rows 1m [--database-url sqlite:///./bench_1m.db]
+Row counts accept k/m suffixes (10k, 1m, 10m). created_at is spread evenly over
+the --days before the build, in row order. Rollups are rebuilt after loading, so
+/dashboard-data and /visualize see the same state the API would have built.
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.orm import Session
+
+from benchmarks.common import BACKEND_DIR
+from feature_encoder import FeatureEncoder
+from models import Base, ReturnPrediction, Stock
+from rollups import rebuild_hourly_rollups, rebuild_rollups, utcnow
+
+PRESETS = ("10k", "1m", "10m")
+DEFAULT_STOCKS = {"Laptops": 50, "Shirts": 100, "Shoes": 75}
+DEFAULT_DAYS = 90
+
+
+def parse_rows(value: str):
+    value = str(value).strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * multiplier)
+
+
+def default_url(rows: int):
+    label = f"{rows // 1_000_000}m" if rows % 1_000_000 == 0 else f"{rows // 1_000}k" if rows % 1_000 == 0 else str(rows)
+    return f"sqlite:///./bench_{label}.db"
+
+
+def category_levels():
+    with open(os.path.join(BACKEND_DIR, "model", "input_columns.json")) as f:
+        encoder = FeatureEncoder(json.load(f))
+    return {field: np.array(list(values)) for field, values in encoder.category_index.items()}
+
+
+def synthetic_rows(n: int, rng, categories, created_at=None):
+    """``n`` prediction row dicts with the same columns /predict-return stores.
+
+    ``created_at`` is an optional sequence of ``n`` timestamps.
+    """
+    pick = {field: values[rng.integers(len(values), size=n)] for field, values in categories.items()}
+    probability = np.round(rng.beta(2, 3, size=n), 3)
+    rating = rng.integers(2, 11, size=n) / 2
+    delivery = rng.integers(1, 15, size=n)
+    past_returns = rng.integers(0, 10, size=n)
+    return [
+        {
+            "product_category": str(pick["Product_Category"][i]),
+            "product_size": str(pick["Product_Size"][i]),
+            "customer_region": str(pick["Customer_Region"][i]),
+            "customer_age_group": str(pick["Customer_Age_Group"][i]),
+            "past_return_count": int(past_returns[i]),
+            "product_rating": float(rating[i]),
+            "delivery_time_days": int(delivery[i]),
+            "prediction": "Yes" if probability[i] > 0.5 else "No",
+            "return_probability": float(probability[i]),
+            "created_at": created_at[i] if created_at is not None else None,
+        }
+        for i in range(n)
+    ]
+
+
+def build_database(url: str, rows: int, chunk_size: int = 50_000, seed: int = 0, replace: bool = False,
+                   days: float = DEFAULT_DAYS):
+    """Create (or top up) a database at ``url`` holding ``rows`` synthetic predictions over the last ``days``."""
+    engine = create_engine(url)
+    if url.startswith("sqlite"):
+        @event.listens_for(engine, "connect")
+        def _fast_load(dbapi_connection, _):
+            # Bulk load only: durability doesn't matter for a throwaway benchmark file
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=OFF")
+            cursor.close()
+
+    if replace:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    started = time.perf_counter()
+    with Session(engine) as db:
+        existing = db.query(func.count(ReturnPrediction.id)).scalar()
+        if db.query(Stock).first() is None:
+            db.add_all([Stock(name=name, quantity=quantity) for name, quantity in DEFAULT_STOCKS.items()])
+            db.commit()
+
+    rng = np.random.default_rng(seed + existing)
+    categories = category_levels()
+    table = ReturnPrediction.__table__
+    first = utcnow() - datetime.timedelta(days=days)
+    step = datetime.timedelta(days=days) / max(rows, 1)
+    remaining = max(0, rows - existing)
+    while remaining:
+        n = min(chunk_size, remaining)
+        offset = rows - remaining
+        created_at = [first + step * (offset + i) for i in range(n)]
+        with engine.begin() as conn:
+            conn.execute(table.insert(), synthetic_rows(n, rng, categories, created_at))
+        remaining -= n
+        print(f"\r{rows - remaining:,}/{rows:,} rows", end="", file=sys.stderr)
+    if rows > existing:
+        print(file=sys.stderr)
+
+    with Session(engine) as db:
+        cells = rebuild_rollups(db)
+        hourly_cells = rebuild_hourly_rollups(db)
+        db.commit()
+    engine.dispose()
+    return {"rows": max(rows, existing), "inserted": max(0, rows - existing), "rollup_cells": cells,
+            "hourly_rollup_cells": hourly_cells, "seconds": round(time.perf_counter() - started, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="10k", help=f"row count, e.g. {', '.join(PRESETS)}")
+    parser.add_argument("--database-url", help="target database (default: sqlite:///./bench_<rows>.db)")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--days", type=float, default=DEFAULT_DAYS, help="span of created_at, ending now")
+    parser.add_argument("--replace", action="store_true", help="drop existing tables first")
+    args = parser.parse_args()
+
+    rows = parse_rows(args.rows)
+    url = args.database_url or default_url(rows)
+    result = build_database(url, rows, args.chunk_size, args.seed, args.replace, args.days)
+    print(json.dumps({"database_url": url, **result}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
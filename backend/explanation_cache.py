@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ExplanationCache:
+    """Bounded LRU + TTL cache for SHAP explanations.
+
+    Entries are keyed on the model version and the raw bytes of the encoded
+    feature row, so identical inputs scored by the same model share one
+    explanation. Changing the model version drops every entry.
+    ``max_entries=0`` disables caching; ``ttl_seconds=0`` disables expiry.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 3600, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.model_version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def set_model_version(self, version):
+        """Switch to ``version``, invalidating all entries if it differs from the current one."""
+        with self._lock:
+            if version == self.model_version:
+                return
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.model_version = version
+
+    def key(self, row, version=None):
+        """Cache key for an encoded row scored by ``version`` (default: the current version)."""
+        return (version if version is not None else self.model_version, row.tobytes())
+
+    def get(self, key):
+        if self.max_entries <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, stored_at = entry
+            if self.ttl_seconds and self.clock() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            # Ignore results computed against a model that has since been replaced
+            if key[0] != self.model_version:
+                return
+            self._entries[key] = (value, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "model_version": self.model_version,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,317 @@
+"""Export return_predictions to Parquet, Arrow IPC or CSV in fixed-size record batches.
+
+Run from backend/:
+    python export_predictions.py predictions.parquet
+    python export_predictions.py nightly.parquet --state export_state.json     # only rows added since the last run
+    python export_predictions.py since_june.arrow --since 2026-06-01T00:00:00
+    python export_predictions.py predictions.csv --after-id 1000000
+
+Rows are read in id order with a streaming cursor (yield_per) and written one
+batch at a time, so memory stays flat whatever the table size. A ``--state``
+run resumes after the last exported id, and also re-reads the rows created in
+the last --overlap-seconds before it. Those rows catch ids that committed out of
+order; rows already exported are skipped. --after-id alone has no such window. Parquet and
+Arrow need pyarrow; without it the export falls back to CSV. The same writer
+backs GET /predictions/export.
+"""
+import argparse
+import csv
+import datetime
+import io
+import json
+import os
+import sys
+import time
+
+from sqlalchemy import or_, select
+
+from logger_config import get_logger
+from models import ReturnPrediction
+from rollups import naive_utc
+
+logger = get_logger(__name__)
+
+EXPORT_FORMATS = ("parquet", "arrow", "csv")
+EXPORT_MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "csv": "text/csv",
+}
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "50000"))
+# --state runs also re-read rows created this long before the last exported one: on PostgreSQL a
+# smaller id can commit after a larger one (write-behind flushes, bulk loads), so id > last_id alone skips it
+EXPORT_STATE_OVERLAP_SECONDS = float(os.getenv("EXPORT_STATE_OVERLAP_SECONDS", "300"))
+
+COLUMNS = [column.name for column in ReturnPrediction.__table__.columns]
+_CREATED_AT = COLUMNS.index("created_at")
+
+
+def pyarrow_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def resolve_format(format: str):
+    """``format``, or "csv" (with a warning) when it needs pyarrow and pyarrow isn't installed."""
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    if format != "csv" and not pyarrow_available():
+        logger.warning("⚠️ pyarrow is not installed; exporting CSV instead of %s", format)
+        return "csv"
+    return format
+
+
+def format_for_path(path: str):
+    extension = os.path.splitext(path)[1].lower()
+    return {".parquet": "parquet", ".pq": "parquet", ".arrow": "arrow", ".feather": "arrow",
+            ".arrows": "arrow"}.get(extension, "csv")
+
+
+def arrow_schema():
+    import pyarrow as pa
+
+    types = {"id": pa.int64(), "past_return_count": pa.int64(), "delivery_time_days": pa.int64(),
+             "product_rating": pa.float64(), "return_probability": pa.float64(),
+             "created_at": pa.timestamp("us")}
+    return pa.schema([(name, types.get(name, pa.string())) for name in COLUMNS])
+
+
+def iter_batches(db, after_id: int = None, since: datetime.datetime = None, batch_size: int = EXPORT_BATCH_SIZE,
+                 recheck_since: datetime.datetime = None, skip_ids=None):
+    """Yield lists of row tuples (in COLUMNS order) of at most ``batch_size``, ordered by id.
+
+    ``after_id`` keeps rows with a larger id, plus with ``recheck_since`` any
+    created after that time; ``skip_ids`` drops rows already exported.
+    ``since`` keeps rows created after that time.
+    """
+    table = ReturnPrediction.__table__
+    query = select(*table.columns).order_by(table.c.id)
+    if after_id is not None:
+        if recheck_since is not None:
+            query = query.where(or_(table.c.id > after_id, table.c.created_at > naive_utc(recheck_since)))
+        else:
+            query = query.where(table.c.id > after_id)
+    if since is not None:
+        query = query.where(table.c.created_at > naive_utc(since))
+    result = db.execute(query.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        if skip_ids:
+            partition = [row for row in partition if row[0] not in skip_ids]
+        if partition:
+            yield partition
+
+
+class BatchWriter:
+    """Writes row batches to a binary file-like object in one of EXPORT_FORMATS.
+
+    Arrow is written in the IPC stream format, or with ``ipc_file=True`` the
+    IPC file format (random access, needs a seekable sink).
+    """
+
+    def __init__(self, sink, format: str, ipc_file: bool = False):
+        self.sink = sink
+        self.format = format
+        self.rows = 0
+        self.last_id = None
+        self.last_created_at = None
+        self._writer = None
+        if format == "csv":
+            self._text = io.TextIOWrapper(sink, encoding="utf-8", newline="", write_through=True)
+            self._csv = csv.writer(self._text)
+            self._csv.writerow(COLUMNS)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            self._schema = arrow_schema()
+            if format == "parquet":
+                self._writer = pq.ParquetWriter(sink, self._schema)
+            elif ipc_file:
+                self._writer = pa.ipc.new_file(sink, self._schema)
+            else:
+                self._writer = pa.ipc.new_stream(sink, self._schema)
+
+    def write(self, rows):
+        if not rows:
+            return
+        if self.format == "csv":
+            self._csv.writerows(rows)
+        else:
+            import pyarrow as pa
+
+            arrays = [pa.array([row[i] for row in rows], type=field.type) for i, field in enumerate(self._schema)]
+            self._writer.write_batch(pa.record_batch(arrays, schema=self._schema))
+        self.rows += len(rows)
+        self.last_id = rows[-1][0]
+        self.last_created_at = max(
+            (row[_CREATED_AT] for row in rows if row[_CREATED_AT] is not None), default=self.last_created_at
+        )
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        elif self.format == "csv":
+            self._text.flush()
+            self._text.detach()
+
+
+class ChunkBuffer(io.RawIOBase):
+    """Write-only sink that hands out what was written since the last ``take``; used to stream a response."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def stream_export(session_factory, format: str, after_id: int = None, since: datetime.datetime = None,
+                  batch_size: int = EXPORT_BATCH_SIZE):
+    """Generator of file bytes for an export, one record batch at a time (for StreamingResponse)."""
+    buffer = ChunkBuffer()
+    writer = BatchWriter(buffer, format)
+    db = session_factory()
+    try:
+        for rows in iter_batches(db, after_id, since, batch_size):
+            writer.write(rows)
+            yield buffer.take()
+        writer.close()
+        yield buffer.take()
+        logger.info("📤 Exported %d predictions as %s (last id %s)", writer.rows, format, writer.last_id)
+    finally:
+        db.close()
+
+
+def load_state(path: str):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(path: str, state: dict):
+    # Write then rename, so an interrupted run never leaves a truncated state file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def export_to_file(path: str, format: str = None, after_id: int = None, since: datetime.datetime = None,
+                   batch_size: int = EXPORT_BATCH_SIZE, session_factory=None,
+                   recheck_since: datetime.datetime = None, exported: dict = None, overlap: datetime.timedelta = None):
+    """Export to ``path``; returns a summary with the row count and last exported id/timestamp.
+
+    For incremental runs, ``recheck_since`` and ``exported`` (``{id: created_at}``
+    of rows a previous run already wrote) go to iter_batches; with ``overlap``,
+    the summary's ``recent`` lists the exported rows created within that long
+    of the newest one, to pass as ``exported`` next time.
+    """
+    if session_factory is None:
+        from database import SessionLocal as session_factory
+    requested = format or format_for_path(path)
+    format = resolve_format(requested)
+    if format != requested:
+        path = os.path.splitext(path)[0] + ".csv"
+    started = time.perf_counter()
+    # Written under a temporary name, so a failed run never leaves a truncated export in place
+    tmp_path = f"{path}.partial"
+    try:
+        with open(tmp_path, "wb") as f:
+            writer = BatchWriter(f, format, ipc_file=True)
+            db = session_factory()
+            recent = dict(exported or {})
+            try:
+                for rows in iter_batches(db, after_id, since, batch_size, recheck_since, exported):
+                    writer.write(rows)
+                    if overlap is not None and writer.last_created_at is not None:
+                        cutoff = writer.last_created_at - overlap
+                        recent.update((row[0], row[_CREATED_AT]) for row in rows
+                                      if row[_CREATED_AT] is not None and row[_CREATED_AT] > cutoff)
+                        recent = {row_id: created for row_id, created in recent.items() if created > cutoff}
+            finally:
+                writer.close()
+                db.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    elapsed = time.perf_counter() - started
+    return {
+        "path": path,
+        "format": format,
+        "rows": writer.rows,
+        # Rows re-read from the overlap window can all be below after_id
+        "last_id": max((i for i in (writer.last_id, after_id) if i is not None), default=None),
+        "last_created_at": writer.last_created_at.isoformat() if writer.last_created_at else None,
+        "recent": sorted([row_id, created.isoformat()] for row_id, created in recent.items()),
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(writer.rows / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output", help="target file; the extension picks the format (.parquet, .arrow, .csv)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, help="override the format implied by the extension")
+    parser.add_argument("--after-id", type=int, help="only rows with a larger id")
+    parser.add_argument("--since", type=datetime.datetime.fromisoformat, help="only rows created after this UTC time")
+    parser.add_argument("--state", help="JSON file recording the last exported id; read before and updated after")
+    parser.add_argument("--overlap-seconds", type=float, default=EXPORT_STATE_OVERLAP_SECONDS,
+                        help="with --state, also re-check rows created this long before the last exported one")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE, help="rows per record batch")
+    parser.add_argument("--database-url", help="database to export (default: the app database)")
+    args = parser.parse_args()
+
+    session_factory = None
+    if args.database_url:
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        session_factory = sessionmaker(bind=create_engine(args.database_url))
+
+    state = load_state(args.state)
+    after_id, recheck_since, exported = args.after_id, None, None
+    if after_id is None and state.get("last_id") is not None:
+        after_id = state["last_id"]
+        if state.get("last_created_at"):
+            recheck_since = datetime.datetime.fromisoformat(state["last_created_at"]) - \
+                datetime.timedelta(seconds=args.overlap_seconds)
+            exported = {row_id: datetime.datetime.fromisoformat(created) for row_id, created in state.get("recent", [])}
+    overlap = datetime.timedelta(seconds=args.overlap_seconds) if args.state else None
+    summary = export_to_file(args.output, args.format, after_id, args.since, args.batch_size, session_factory,
+                             recheck_since, exported, overlap)
+    if args.state:
+        save_state(args.state, {
+            "last_id": summary["last_id"],
+            "last_created_at": summary["last_created_at"] or state.get("last_created_at"),
+            # Rows from the overlap window already exported, so the next run doesn't write them twice
+            "recent": summary["recent"],
+            "last_output": summary["path"],
+            "exported_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        })
+    print(f"✅ Exported {summary['rows']} rows ({summary['format']}) in {summary['seconds']}s "
+          f"({summary['rows_per_sec']} rows/s), last id {summary['last_id']} -> {summary['path']}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
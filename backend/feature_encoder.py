@@ -0,0 +1,95 @@
+import math
+import numpy as np
+
+# Raw request fields that are one-hot encoded as "<field>_<value>" columns
+CATEGORICAL_FIELDS = ['Product_Category', 'Product_Size', 'Customer_Region', 'Customer_Age_Group']
+
+# Training fills missing categoricals with this level (see notebooks/train_model.py)
+UNKNOWN_CATEGORY = "Unknown"
+
+# Strings pandas.read_csv would have parsed as NaN, e.g. the "NA" sizes in smart_returns_dataset.csv
+MISSING_VALUES = {"", "NA", "N/A", "NaN", "nan", "None", "null", "NULL"}
+
+
+class FeatureEncoder:
+    """One-hot encoder compiled once from the model's input columns.
+
+    Each categorical value maps straight to its column index, so encoding is a
+    dict lookup plus a write into a zeroed float array. The output matches
+    ``pd.get_dummies`` followed by a reindex on ``input_columns.json``.
+
+    Missing values (None, NaN or one of ``MISSING_VALUES``) are treated as
+    ``UNKNOWN_CATEGORY``. A value with no column of its own goes to the
+    ``<field>_Unknown`` column if the model was trained with one; otherwise all
+    of that field's columns stay 0, which is what the reindex used to produce.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.n_features = len(self.columns)
+        self.numeric_fields = []
+        self.category_index = {field: {} for field in CATEGORICAL_FIELDS}
+
+        for idx, column in enumerate(self.columns):
+            field = self._categorical_field(column)
+            if field is None:
+                self.numeric_fields.append((column, idx))
+            else:
+                self.category_index[field][column[len(field) + 1:]] = idx
+
+        self.unknown_index = {
+            field: values.get(UNKNOWN_CATEGORY, -1) for field, values in self.category_index.items()
+        }
+
+    @staticmethod
+    def _categorical_field(column):
+        for field in CATEGORICAL_FIELDS:
+            if column.startswith(field + "_"):
+                return field
+        return None
+
+    def column_index(self, field, value):
+        """Return the column set by ``value`` for ``field``, or -1 when none is."""
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            value = UNKNOWN_CATEGORY
+        else:
+            value = str(value).strip()
+            if value in MISSING_VALUES:
+                value = UNKNOWN_CATEGORY
+        idx = self.category_index[field].get(value)
+        return self.unknown_index[field] if idx is None else idx
+
+    def encode_columns(self, data, n_rows: int):
+        """Encode column-oriented input (a dict of sequences or a DataFrame) into an (n_rows, n_features) array."""
+        X = np.zeros((n_rows, self.n_features), dtype=np.float64)
+        if n_rows == 0:
+            return X
+
+        for field, idx in self.numeric_fields:
+            X[:, idx] = np.asarray(data[field], dtype=np.float64)
+
+        rows = np.arange(n_rows)
+        for field in CATEGORICAL_FIELDS:
+            cols = np.fromiter(
+                (self.column_index(field, value) for value in data[field]), dtype=np.intp, count=n_rows
+            )
+            hit = cols >= 0
+            X[rows[hit], cols[hit]] = 1.0
+        return X
+
+    def encode_many(self, records: list):
+        """Encode a list of request dicts into one 2-D array, preserving order."""
+        fields = [field for field, _ in self.numeric_fields] + CATEGORICAL_FIELDS
+        data = {field: [record.get(field) for record in records] for field in fields}
+        return self.encode_columns(data, len(records))
+
+    def encode(self, record: dict):
+        """Encode a single request dict into a (1, n_features) array."""
+        X = np.zeros((1, self.n_features), dtype=np.float64)
+        for field, idx in self.numeric_fields:
+            X[0, idx] = float(record[field])
+        for field in CATEGORICAL_FIELDS:
+            idx = self.column_index(field, record.get(field))
+            if idx >= 0:
+                X[0, idx] = 1.0
+        return X
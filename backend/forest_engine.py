@@ -0,0 +1,64 @@
+import numpy as np
+
+
+class FlatForest:
+    """Array-backed copy of a fitted RandomForestClassifier for fast inference.
+
+    All trees are concatenated into contiguous node arrays (feature, threshold,
+    left, right, value). Leaves point back at themselves, so a batch of rows is
+    evaluated by stepping every (row, tree) cursor ``max_depth`` times with
+    plain NumPy indexing, skipping sklearn's input validation and per-estimator
+    dispatch. ``predict_proba`` matches the sklearn model within float
+    tolerance for inputs without NaNs.
+    """
+
+    def __init__(self, forest):
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        if any(tree.n_outputs != 1 for tree in trees):
+            raise ValueError("FlatForest only supports single-output classifiers")
+
+        sizes = np.array([tree.node_count for tree in trees], dtype=np.intp)
+        offsets = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.intp)
+
+        features, thresholds, lefts, rights, values = [], [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            node_ids = np.arange(tree.node_count, dtype=np.intp) + offset
+            is_leaf = tree.children_left == -1
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.intp))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+
+            # Older sklearn stores class counts, newer stores fractions; normalise both
+            value = tree.value[:, 0, :].astype(np.float64)
+            totals = value.sum(axis=1, keepdims=True)
+            totals[totals == 0] = 1.0
+            values.append(value / totals)
+
+        self.feature = np.concatenate(features)
+        self.threshold = np.concatenate(thresholds)
+        self.left = np.concatenate(lefts)
+        self.right = np.concatenate(rights)
+        self.value = np.concatenate(values)
+        self.roots = offsets
+        self.max_depth = max(tree.max_depth for tree in trees)
+        self.n_features = forest.n_features_in_
+        self.classes_ = forest.classes_
+
+    def predict_proba(self, X):
+        # sklearn compares float32 features against float64 thresholds; do the same
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+
+        # Index the raveled matrix directly; cheaper than 2-D fancy indexing
+        flat_X = np.ascontiguousarray(X).ravel()
+        row_starts = (np.arange(X.shape[0], dtype=np.intp) * self.n_features)[:, None]
+        nodes = np.tile(self.roots, (X.shape[0], 1))
+        for _ in range(self.max_depth):
+            go_left = flat_X[row_starts + self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return self.value[nodes].mean(axis=1)
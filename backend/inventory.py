@@ -0,0 +1,154 @@
+import random
+import time
+
+from sqlalchemy import Integer, String, any_, bindparam, func, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from logger_config import get_logger
+from models import Stock
+
+logger = get_logger(__name__)
+
+# Lock-wait errors worth retrying: SQLite "database is locked", PostgreSQL deadlock / serialization failure
+_RETRYABLE_SQLSTATES = {"40P01", "40001"}
+
+
+class StockAdjustmentRejected(Exception):
+    """Raised when a batch can't be applied as a whole; nothing was changed.
+
+    ``problems`` has one entry per offending stock with a ``reason`` of
+    "unknown", "version_conflict" or "insufficient".
+    """
+
+    def __init__(self, problems: list):
+        self.problems = problems
+        super().__init__(f"{len(problems)} stock adjustment(s) rejected")
+
+
+def merge_adjustments(adjustments):
+    """Sum the deltas per stock name; returns ``{name: (delta, expected_version)}``."""
+    merged = {}
+    for item in adjustments:
+        name, expected = item["name"], item.get("expected_version")
+        delta, previous_expected = merged.get(name, (0, None))
+        if expected is not None and previous_expected is not None and expected != previous_expected:
+            raise ValueError(f"Conflicting expected_version values for {name}")
+        merged[name] = (delta + item["delta"], expected if expected is not None else previous_expected)
+    return merged
+
+
+def _adjust_statement(allow_negative: bool, name, delta, expected):
+    """Core UPDATE of stocks (no ORM bookkeeping) for one adjustment given as SQL expressions."""
+    table = Stock.__table__
+    quantity = func.coalesce(table.c.quantity, 0)
+    version = func.coalesce(table.c.version, 0)
+    # coalesce(expected, version) = version is true when no version was given; it also
+    # lets PostgreSQL infer the parameter type, which a bare "expected IS NULL" doesn't
+    stmt = update(table).where(table.c.name == name, func.coalesce(expected, version) == version)
+    if not allow_negative:
+        stmt = stmt.where(quantity + delta >= 0)
+    return stmt.values(quantity=quantity + delta, version=version + 1)
+
+
+def _update_postgresql(db, rows: list, allow_negative: bool):
+    table = Stock.__table__
+    names = bindparam("b_names", type_=ARRAY(String))
+    # Lock the rows in name order first, so concurrent batches queue instead of deadlocking
+    db.execute(select(table.c.id).where(table.c.name == any_(names)).order_by(table.c.name).with_for_update(),
+               {"b_names": [name for name, _ in rows]})
+    # Then one UPDATE ... FROM unnest(arrays) RETURNING the new values: three parameters whatever
+    # the batch size, so the statement is compiled once and applied in a single round trip
+    source = select(
+        func.unnest(names).label("name"),
+        func.unnest(bindparam("b_deltas", type_=ARRAY(Integer))).label("delta"),
+        func.unnest(bindparam("b_expected", type_=ARRAY(Integer))).label("expected"),
+    ).subquery("adjustments")
+    stmt = _adjust_statement(allow_negative, source.c.name, source.c.delta, source.c.expected)
+    return db.execute(stmt.returning(table.c.name, table.c.quantity, table.c.version), {
+        "b_names": [name for name, _ in rows],
+        "b_deltas": [delta for _, (delta, _) in rows],
+        "b_expected": [expected for _, (_, expected) in rows],
+    }).all()
+
+
+def _update_each(db, rows: list, allow_negative: bool):
+    # executemany in name order: the same row order in every transaction, so batches can't deadlock
+    stmt = _adjust_statement(allow_negative, bindparam("b_name"), bindparam("b_delta"), bindparam("b_expected"))
+    params = [{"b_name": name, "b_delta": delta, "b_expected": expected} for name, (delta, expected) in rows]
+    if db.get_bind().dialect.supports_sane_multi_rowcount:
+        return db.execute(stmt, params).rowcount
+    return sum(db.execute(stmt, p).rowcount for p in params)
+
+
+def _rejections(db, merged: dict, allow_negative: bool):
+    rows = {row.name: row for row in db.execute(
+        select(Stock.name, Stock.quantity, Stock.version).where(Stock.name.in_(merged))
+    )}
+    problems = []
+    for name, (delta, expected) in sorted(merged.items()):
+        row = rows.get(name)
+        if row is None:
+            problems.append({"name": name, "reason": "unknown"})
+            continue
+        current = {"current_quantity": row.quantity, "current_version": row.version or 0}
+        if expected is not None and expected != (row.version or 0):
+            problems.append({"name": name, "reason": "version_conflict", "expected_version": expected, **current})
+        elif not allow_negative and (row.quantity or 0) + delta < 0:
+            problems.append({"name": name, "reason": "insufficient", "delta": delta, **current})
+    return problems
+
+
+def _is_retryable(error: DBAPIError):
+    if isinstance(error, OperationalError) and "locked" in str(error.orig).lower():
+        return True
+    return getattr(error.orig, "sqlstate", None) in _RETRYABLE_SQLSTATES
+
+
+def _apply_once(db, merged: dict, allow_negative: bool):
+    rows = sorted(merged.items())
+    updated_rows = None
+    if db.get_bind().dialect.name == "postgresql":
+        updated_rows = _update_postgresql(db, rows, allow_negative)
+        updated = len(updated_rows)
+    else:
+        updated = _update_each(db, rows, allow_negative)
+
+    if updated != len(rows):
+        db.rollback()
+        # If the re-read finds nothing wrong, a concurrent batch changed these rows in between
+        raise StockAdjustmentRejected(
+            _rejections(db, merged, allow_negative) or [{"name": None, "reason": "version_conflict"}]
+        )
+
+    if updated_rows is None:
+        # Still inside the transaction, so these are the values this batch produced
+        updated_rows = db.execute(select(Stock.name, Stock.quantity, Stock.version).where(Stock.name.in_(merged)))
+    stocks = sorted(({"name": row.name, "quantity": row.quantity, "version": row.version} for row in updated_rows),
+                    key=lambda stock: stock["name"])
+    db.commit()
+    return stocks
+
+
+def adjust_stocks(db, adjustments, allow_negative: bool = False, retries: int = 3):
+    """Apply ``[{"name", "delta", "expected_version"?}, ...]`` in one transaction.
+
+    Each stock is changed with an in-database ``quantity = quantity + delta``
+    (deltas for the same name are summed first) and its ``version`` is bumped.
+    A stock is only updated if it exists, matches ``expected_version`` when one
+    is given, and (unless ``allow_negative``) doesn't go below zero; if any
+    stock fails, the whole batch is rolled back and StockAdjustmentRejected
+    lists why. Lock timeouts and deadlocks are retried up to ``retries`` times
+    with jittered backoff. Returns the new quantity and version per stock.
+    """
+    merged = merge_adjustments(adjustments)
+    for attempt in range(retries + 1):
+        try:
+            stocks = _apply_once(db, merged, allow_negative)
+            return {"applied": len(adjustments), "stocks": stocks, "attempts": attempt + 1}
+        except DBAPIError as e:
+            db.rollback()
+            if attempt == retries or not _is_retryable(e):
+                raise
+            logger.warning("⚠️ Stock adjustment hit a lock (%s), retry %d/%d", e.orig, attempt + 1, retries)
+            time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
@@ -0,0 +1,155 @@
+import asyncio
+import os
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+# Upper bounds so a single request can't pull an unbounded amount of the log into memory
+MAX_TAIL_LINES = 5000
+MAX_RANGE_BYTES = 1 << 20
+# A filtered tail stops scanning backwards after this many bytes even if it found fewer lines
+MAX_TAIL_SCAN_BYTES = 64 << 20
+BLOCK_SIZE = 64 << 10
+
+
+def line_matches(line: str, level: str = None, contains: str = None):
+    """True when ``line`` has the given level and contains the given substring (both optional).
+
+    Understands both the text format ("time | LEVEL | message") and JSON lines.
+    """
+    if level:
+        level = level.upper()
+        if f"| {level} |" not in line and f'"level": "{level}"' not in line:
+            return False
+    if contains and contains not in line:
+        return False
+    return True
+
+
+def _decode(raw: bytes):
+    return raw.decode("utf-8", errors="replace").rstrip("\r")
+
+
+def file_size(path: str):
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def tail_lines(path: str, lines: int = 200, level: str = None, contains: str = None,
+               max_scan_bytes: int = MAX_TAIL_SCAN_BYTES):
+    """Return the last ``lines`` matching lines and the file size they were read up to.
+
+    The file is read backwards in fixed-size blocks, so the cost depends on
+    how far back the matches are, not on the size of the log.
+    """
+    lines = max(0, min(lines, MAX_TAIL_LINES))
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        position = end
+        found = []
+        remainder = b""
+        while position > 0 and len(found) < lines and end - position < max_scan_bytes:
+            step = min(BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            chunk = f.read(step) + remainder
+            parts = chunk.split(b"\n")
+            # The first part may be the tail end of a line that starts in an earlier block
+            remainder = parts.pop(0) if position > 0 else b""
+            for raw in reversed(parts):
+                if not raw:
+                    continue
+                line = _decode(raw)
+                if line_matches(line, level, contains):
+                    found.append(line)
+                    if len(found) == lines:
+                        break
+    found.reverse()
+    return found, end
+
+
+def read_range(path: str, offset: int = 0, max_bytes: int = 64 << 10, level: str = None, contains: str = None):
+    """Read whole lines starting at byte ``offset``, up to ``max_bytes``.
+
+    Returns ``(entries, next_offset)``: ``entries`` are ``(line, line_end)``
+    pairs, where ``line_end`` is the byte after that line (resuming there
+    continues with the next line), and ``next_offset`` is the byte after the
+    last complete line consumed; pass it back to continue. A trailing line with
+    no newline yet is left for the next call. A line longer than ``max_bytes``
+    is returned cut to ``max_bytes``. If ``offset`` is past the end of the file
+    (the log was truncated or rotated), reading restarts at 0.
+    """
+    max_bytes = max(1, min(max_bytes, MAX_RANGE_BYTES))
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if offset < 0 or offset > size:
+            offset = 0
+        f.seek(offset)
+        chunk = f.read(max_bytes)
+        cut = chunk.rfind(b"\n")
+        if cut == -1 and len(chunk) == max_bytes:
+            # One line longer than max_bytes: keep its start and skip to its end block by block,
+            # rather than stall or read the whole line into memory
+            line_end = _skip_line(f)
+            if line_end is None:
+                return [], offset
+            line = _decode(chunk) + " [truncated]"
+            return ([(line, line_end)] if line_matches(line, level, contains) else []), line_end
+        if cut == -1:
+            return [], offset
+        chunk = chunk[:cut + 1]
+
+    found = []
+    line_end = offset
+    for raw in chunk.split(b"\n")[:-1]:
+        line_end += len(raw) + 1
+        if not raw:
+            continue
+        line = _decode(raw)
+        if line_matches(line, level, contains):
+            found.append((line, line_end))
+    return found, offset + len(chunk)
+
+
+def _skip_line(f):
+    """Offset just past the next newline from the current position, or None if the line isn't finished."""
+    while True:
+        block = f.read(BLOCK_SIZE)
+        if not block:
+            return None
+        newline = block.find(b"\n")
+        if newline != -1:
+            return f.tell() - len(block) + newline + 1
+
+
+async def follow(path: str, offset: int = None, level: str = None, contains: str = None,
+                 poll_interval: float = 1.0, heartbeat_interval: float = 15.0):
+    """Yield ``(line, line_end)`` for lines appended after ``offset`` (default: end of file).
+
+    ``line_end`` is the offset to resume from to get the lines after this one.
+    Yields ``(None, offset)`` as a heartbeat when nothing was written for
+    ``heartbeat_interval`` seconds. Only one block is held in memory at a time.
+    """
+    if offset is None:
+        offset = file_size(path)
+    idle = 0.0
+    while True:
+        if os.path.exists(path):
+            found, next_offset = await asyncio.to_thread(read_range, path, offset, BLOCK_SIZE, level, contains)
+        else:
+            found, next_offset = [], 0
+        progressed = next_offset != offset
+        offset = next_offset
+        for line, line_end in found:
+            yield line, line_end
+        if progressed:
+            idle = 0.0
+            continue
+        idle += poll_interval
+        if idle >= heartbeat_interval:
+            idle = 0.0
+            yield None, offset
+        await asyncio.sleep(poll_interval)
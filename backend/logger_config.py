@@ -1,20 +1,122 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import random
+import threading
 
 # Get the root directory of the project (SupplyChain-main)
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 
 # Define correct path for the actual log file at root level
-LOG_FILE_PATH = os.path.join(BASE_DIR, "app.log")
-
-# Set up the logger
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_FILE_PATH, encoding="utf-8"),
-        logging.StreamHandler()
-    ]
-)
-
-logger = logging.getLogger(__name__)
+LOG_FILE_PATH = os.getenv("LOG_FILE", os.path.join(BASE_DIR, "app.log"))
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "text" keeps the "time | LEVEL | message" lines; "json" writes one JSON object per line
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_CONSOLE = os.getenv("LOG_CONSOLE", "1") == "1"
+# Fraction of INFO/DEBUG records kept per logger, e.g. "predict_logic=0.1,main=0.5"
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+
+TEXT_FORMAT = "%(asctime)s | %(levelname)s | %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message (+ exception)."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep roughly ``rate`` of the records at INFO and below; warnings and errors always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = max(0.0, min(1.0, rate))
+
+    def filter(self, record):
+        return record.levelno > logging.INFO or random.random() < self.rate
+
+
+def parse_sample_rates(spec: str):
+    rates = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, rate = item.split("=", 1)
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+_sample_rates = parse_sample_rates(LOG_SAMPLE_RATES)
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def get_logger(name: str):
+    """Module logger, with a SamplingFilter attached when LOG_SAMPLE_RATES lists it."""
+    log = logging.getLogger(name)
+    rate = _sample_rates.get(name)
+    if rate is not None and rate < 1 and not any(isinstance(f, SamplingFilter) for f in log.filters):
+        log.addFilter(SamplingFilter(rate))
+    return log
+
+
+def setup_logging():
+    """Route all logging through a queue to one background writer thread (idempotent).
+
+    Request threads only format the message and put the record on the queue;
+    the QueueListener thread does the file and console I/O. The log file
+    rotates at LOG_MAX_BYTES, keeping LOG_BACKUP_COUNT old files.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+
+        formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+        handlers = [logging.handlers.RotatingFileHandler(
+            LOG_FILE_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )]
+        if LOG_CONSOLE:
+            handlers.append(logging.StreamHandler())
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
+        root.setLevel(LOG_LEVEL)
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
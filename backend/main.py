@@ -1,31 +1,109 @@
-from fastapi import FastAPI, HTTPException, Depends, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Depends, Request, Body
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from pydantic import BaseModel
-from typing import Optional
-import os, json, logging
+from pydantic import BaseModel, ValidationError
+from typing import Optional, List, Any
+import os, asyncio, datetime, json, time
+from starlette.requests import ClientDisconnect
 
 # Services
 from services.discount_logic import calculate_discount
 from services.recommendation_logic import recommend_alternative
+from services.catalog import catalog
 
-from logger_config import logger
-from auth import authenticate_user, create_access_token
-from database import SessionLocal, engine
-from models import Base, Stock, ReturnPrediction
-from visualize import stock_bar_chart
-from predict_logic import make_prediction, explain_prediction
+from logger_config import setup_logging, get_logger, LOG_FILE_PATH
+from auth import authenticate_user, create_access_token, get_current_user
+from database import SessionLocal, AsyncSessionLocal, engine
+from models import Base, Stock, ReturnPrediction, ReturnRollup, ReturnHourlyRollup
+from rollups import (record_predictions, rebuild_rollups, rebuild_hourly_rollups, check_rollups, dashboard_summary,
+                     prediction_timeseries, TIMESERIES_BUCKETS, utcnow, naive_utc)
+from visualize import render_chart, CHART_FORMATS
+from log_reader import LOG_LEVELS, tail_lines, read_range, follow, file_size
+from record_stream import STREAM_FORMATS, LineTooLong, record_chunks, DuplexStreamingResponse
+from predict_logic import (make_batch_prediction, explain_batch, assess_batch, explanation_cache, set_model_executor,
+                           warmup, model_status, registry as model_registry)
+from model_registry import ModelValidationError
+from migrations import upgrade_schema
+from pagination import InvalidPageRequest, keyset_page, select_columns
+from inventory import StockAdjustmentRejected, adjust_stocks
+from export_predictions import EXPORT_MEDIA_TYPES, resolve_format, stream_export
+from batching import MicroBatcher
+from model_pool import ModelWorkerPool
+from prediction_writer import PredictionWriter, WriterOverloaded
+from metrics import registry, stage_timer, MetricsMiddleware
+
+# One queue-backed logging setup for the whole process (see logger_config)
+setup_logging()
+logger = get_logger(__name__)
 
 app = FastAPI(title="Smart Returns Optimizer API", version="1.0.0")
 
 # Setup base paths
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-LOG_PATH = os.path.join(BASE_DIR, "app.log")
-PRODUCTS_FILE = os.path.join(BASE_DIR, "data", "products.json")
+LOG_PATH = LOG_FILE_PATH
+
+# Upper bound on items accepted by /predict-return/batch
+MAX_BATCH_SIZE = 1000
+
+# Upper bound on adjustments per /stocks/adjust call, and retries when the stocks rows are locked
+MAX_STOCK_ADJUSTMENTS = int(os.getenv("MAX_STOCK_ADJUSTMENTS", "10000"))
+STOCK_ADJUST_RETRIES = int(os.getenv("STOCK_ADJUST_RETRIES", "3"))
+
+# Records validated and scored together by /predict-return/stream
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "500"))
+
+# Upper bound on points per category returned by /dashboard-data/timeseries
+MAX_TIMESERIES_BUCKETS = 2000
+
+# Micro-batching of concurrent /predict-return and /explain-return calls
+MICRO_BATCH_ENABLED = os.getenv("MICRO_BATCH_ENABLED", "1") == "1"
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "32"))
+MICRO_BATCH_MAX_WAIT_MS = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "2"))
+
+# Worker processes for forest/SHAP work; 0 keeps it in the API process
+MODEL_POOL_SIZE = int(os.getenv("MODEL_POOL_SIZE", "0"))
+MODEL_POOL_WARMUP = os.getenv("MODEL_POOL_WARMUP", "1") == "1"
+MODEL_POOL_MAX_TASKS_PER_CHILD = int(os.getenv("MODEL_POOL_MAX_TASKS_PER_CHILD", "0"))
+
+model_pool = ModelWorkerPool(MODEL_POOL_SIZE, MODEL_POOL_WARMUP, MODEL_POOL_MAX_TASKS_PER_CHILD) if MODEL_POOL_SIZE > 0 else None
+
+# Load the model/explainer (and start the pool) in the background after startup,
+# so the process serves /, /stocks etc. immediately; /ready reports when it's done
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+# Seconds between checks of model/ for new artifacts; 0 disables the watcher (reloads via the admin endpoint only)
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "5"))
+warmup_task = None
+warmup_state = {"status": "pending" if MODEL_WARMUP or model_pool is not None else "lazy", "error": None, "seconds": None}
+
+# Write-behind persistence of ReturnPrediction rows
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "1") == "1"
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "10000"))
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500"))
+WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "200"))
+WRITE_BEHIND_ENQUEUE_TIMEOUT = float(os.getenv("WRITE_BEHIND_ENQUEUE_TIMEOUT", "1.0"))
+
+prediction_writer = PredictionWriter(
+    SessionLocal, WRITE_BEHIND_MAX_QUEUE, WRITE_BEHIND_BATCH_SIZE, WRITE_BEHIND_FLUSH_MS,
+    WRITE_BEHIND_ENQUEUE_TIMEOUT, enabled=WRITE_BEHIND_ENABLED
+)
+
+# With a pool, let one batch per worker run at a time
+predict_batcher = MicroBatcher(
+    "predict", make_batch_prediction, MICRO_BATCH_MAX_SIZE, MICRO_BATCH_MAX_WAIT_MS,
+    max_in_flight=max(1, MODEL_POOL_SIZE), enabled=MICRO_BATCH_ENABLED
+)
+explain_batcher = MicroBatcher(
+    "explain", explain_batch, MICRO_BATCH_MAX_SIZE, MICRO_BATCH_MAX_WAIT_MS,
+    max_in_flight=max(1, MODEL_POOL_SIZE), enabled=MICRO_BATCH_ENABLED
+)
+assess_batcher = MicroBatcher(
+    "assess", assess_batch, MICRO_BATCH_MAX_SIZE, MICRO_BATCH_MAX_WAIT_MS,
+    max_in_flight=max(1, MODEL_POOL_SIZE), enabled=MICRO_BATCH_ENABLED
+)
 
 # Serve frontend if exists
 frontend_path = os.path.join(BASE_DIR, "frontend")
@@ -41,16 +119,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize DB
-Base.metadata.create_all(bind=engine)
-
-# Logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s | %(levelname)s | %(message)s',
-    handlers=[logging.FileHandler(LOG_PATH, encoding="utf-8"), logging.StreamHandler()]
-)
-logger = logging.getLogger(__name__)
+# Request metrics; added last so it wraps everything, including CORS handling
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
 # Dependency
 def get_db():
@@ -60,6 +132,24 @@ def get_db():
     finally:
         db.close()
 
+def _with_session(fn, *args):
+    with SessionLocal() as db:
+        return fn(db, *args)
+
+async def run_read(fn, *args):
+    """Run ``fn(db, *args)`` for a read-only endpoint.
+
+    With ASYNC_DB_ENABLED=1 (and an async driver) this goes through
+    AsyncSessionLocal via ``run_sync``, so the read holds no worker thread
+    while it waits on the database; otherwise it runs in the thread pool
+    with a regular session. Either way SQLite is in WAL mode, so reads
+    don't wait for a prediction write to commit.
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(fn, *args)
+    return await run_in_threadpool(_with_session, fn, *args)
+
 # Schema
 class PredictRequest(BaseModel):
     Product_Category: str
@@ -70,22 +160,58 @@ class PredictRequest(BaseModel):
     Product_Rating: float
     Delivery_Time_Days: int
 
+class AssessRequest(PredictRequest):
+    include_explanation: bool = True
+    include_discount: bool = True
+    include_recommendation: bool = True
+
+class StockAdjustment(BaseModel):
+    name: str
+    delta: int
+    expected_version: Optional[int] = None
+
+class StockAdjustRequest(BaseModel):
+    adjustments: List[StockAdjustment]
+    allow_negative: bool = False
+
+def _prediction_row(input_data: dict, result: dict):
+    return {
+        "product_category": input_data["Product_Category"],
+        "product_size": input_data["Product_Size"],
+        "customer_region": input_data["Customer_Region"],
+        "customer_age_group": input_data["Customer_Age_Group"],
+        "product_rating": input_data["Product_Rating"],
+        "delivery_time_days": input_data["Delivery_Time_Days"],
+        "past_return_count": input_data["Past_Return_Count"],
+        "prediction": result["prediction"],
+        "return_probability": result["return_probability"],
+        "model_version": result.get("model_version"),
+        "created_at": utcnow()
+    }
+
+def _format_validation_error(e: ValidationError):
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in err['loc']) or 'item'}: {err['msg']}" for err in e.errors()
+    )
+
 @app.get("/")
 def read_root():
     return {"message": "Smart Returns Optimizer API is running!"}
 
 @app.on_event("startup")
 def seed_initial_data():
+    # Initialize DB, adding columns/indexes introduced since the database was created
+    upgrade_schema(engine, Base.metadata)
     db = SessionLocal()
-    if db.query(Stock).count() == 0:
+    if db.query(Stock).first() is None:
         db.add_all([
             Stock(name="Shirts", quantity=100),
             Stock(name="Shoes", quantity=50),
             Stock(name="Laptops", quantity=30)
         ])
-    if db.query(ReturnPrediction).count() == 0:
-        db.add_all([
-            ReturnPrediction(
+    if db.query(ReturnPrediction).first() is None:
+        record_predictions(db, [
+            dict(
                 product_category="Shirts",
                 product_size="M",
                 customer_region="North",
@@ -96,7 +222,7 @@ def seed_initial_data():
                 prediction="Yes",
                 return_probability=0.76
             ),
-            ReturnPrediction(
+            dict(
                 product_category="Shoes",
                 product_size="8",
                 customer_region="South",
@@ -107,7 +233,7 @@ def seed_initial_data():
                 prediction="No",
                 return_probability=0.38
             ),
-            ReturnPrediction(
+            dict(
                 product_category="Laptops",
                 product_size="15-inch",
                 customer_region="East",
@@ -119,62 +245,300 @@ def seed_initial_data():
                 return_probability=0.15
             )
         ])
+    elif db.query(ReturnRollup).first() is None or \
+            db.query(ReturnRollup.id).filter(ReturnRollup.rating_count.is_(None)).first() is not None:
+        # Database predates the rollup table, or its rating_count column
+        cells = rebuild_rollups(db)
+        logger.info("📊 Built %d dashboard rollup cells from existing predictions", cells)
+    if (db.query(ReturnHourlyRollup).first() is None and
+            db.query(ReturnPrediction.id).filter(ReturnPrediction.created_at.isnot(None)).first() is not None) or \
+            db.query(ReturnHourlyRollup.id).filter(ReturnHourlyRollup.rating_count.is_(None)).first() is not None:
+        # Timestamped predictions written before the hourly rollup table (or its rating_count) existed
+        cells = rebuild_hourly_rollups(db)
+        logger.info("📊 Built %d hourly rollup cells from existing predictions", cells)
     db.commit()
     db.close()
 
+async def _warm_up_models():
+    started = time.perf_counter()
+    warmup_state["status"] = "loading"
+    try:
+        if MODEL_WARMUP:
+            await run_in_threadpool(warmup)
+        if model_pool is not None:
+            await run_in_threadpool(model_pool.start)
+            set_model_executor(model_pool)
+        warmup_state["status"] = "ready"
+    except Exception as e:
+        warmup_state.update(status="failed", error=str(e))
+        logger.error("❌ Model warmup failed: %s", e)
+    warmup_state["seconds"] = round(time.perf_counter() - started, 3)
+
+def _detach_model_pool(bundle, previous):
+    # Until the workers are replaced, score in-process with the bundle each request picked up
+    if previous is not None and model_pool is not None and model_pool.running:
+        set_model_executor(None)
+
+def _restart_model_pool(bundle, previous):
+    if previous is not None and model_pool is not None and model_pool.running:
+        # Raises if the new workers loaded a different version; scoring then stays in-process
+        model_pool.restart(bundle.version)
+        set_model_executor(model_pool)
+
+model_registry.before_swap.append(_detach_model_pool)
+model_registry.after_swap.append(_restart_model_pool)
+
+@app.on_event("startup")
+async def start_model_workers():
+    global warmup_task
+    await predict_batcher.start()
+    await explain_batcher.start()
+    await assess_batcher.start()
+    prediction_writer.start()
+    if MODEL_WARMUP or model_pool is not None:
+        warmup_state.update(status="pending", error=None, seconds=None)
+        warmup_task = asyncio.create_task(_warm_up_models())
+    model_registry.start_watcher(MODEL_WATCH_INTERVAL)
+
+@app.on_event("shutdown")
+async def stop_model_workers():
+    await run_in_threadpool(model_registry.stop_watcher)
+    if warmup_task is not None:
+        await warmup_task
+    await predict_batcher.stop()
+    await explain_batcher.stop()
+    await assess_batcher.stop()
+    await run_in_threadpool(prediction_writer.stop)
+    if model_pool is not None:
+        set_model_executor(None)
+        await run_in_threadpool(model_pool.shutdown)
+    if AsyncSessionLocal is not None:
+        await AsyncSessionLocal.kw["bind"].dispose()
+
 @app.post("/token")
 def login(form_data: OAuth2PasswordRequestForm = Depends()):
     if not authenticate_user(form_data.username, form_data.password):
-        logger.warning(f"❌ Failed login for: {form_data.username}")
+        logger.warning("❌ Failed login for: %s", form_data.username)
         raise HTTPException(status_code=400, detail="Incorrect username or password")
     token = create_access_token({"sub": form_data.username})
-    logger.info(f"🔐 Login successful: {form_data.username}")
+    logger.info("🔐 Login successful: %s", form_data.username)
     return {"access_token": token, "token_type": "bearer"}
 
+async def _persist_predictions(rows: list, durable: bool):
+    """Hand rows to the write-behind buffer; wait for the commit only if asked to."""
+    with stage_timer("persist"):
+        future = await run_in_threadpool(prediction_writer.enqueue, rows)
+        if durable or future.done():
+            await asyncio.wrap_future(future)
+
 @app.post("/predict-return")
-def predict_return(data: PredictRequest, db: Session = Depends(get_db)):
+async def predict_return(data: PredictRequest, durable: bool = False):
     try:
         input_data = data.dict()
-        result = make_prediction(input_data)
-        db_record = ReturnPrediction(
-            product_category=input_data["Product_Category"],
-            product_size=input_data["Product_Size"],
-            customer_region=input_data["Customer_Region"],
-            customer_age_group=input_data["Customer_Age_Group"],
-            product_rating=input_data["Product_Rating"],
-            delivery_time_days=input_data["Delivery_Time_Days"],
-            past_return_count=input_data["Past_Return_Count"],
-            prediction=result["prediction"],
-            return_probability=result["return_probability"]
-        )
-        db.add(db_record)
-        db.commit()
+        result = await predict_batcher.submit(input_data)
+        await _persist_predictions([_prediction_row(input_data, result)], durable)
         logger.info("✅ Prediction made successfully.")
         return result
+    except WriterOverloaded as e:
+        logger.error("❌ Prediction not stored: %s", e)
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        logger.error(f"❌ Prediction failed: {e}")
+        logger.error("❌ Prediction failed: %s", e)
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
+@app.post("/predict-return/batch")
+def predict_return_batch(items: List[Any] = Body(...), durable: bool = False):
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(items)} items (max {MAX_BATCH_SIZE})")
+
+    # Validate every item up front so one bad line doesn't sink the whole batch
+    results: List[dict] = [None] * len(items)
+    valid_indices, valid_inputs = [], []
+    for i, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise TypeError(f"expected an object, got {type(item).__name__}")
+            valid_inputs.append(PredictRequest(**item).dict())
+            valid_indices.append(i)
+        except ValidationError as e:
+            results[i] = {"index": i, "error": _format_validation_error(e)}
+        except TypeError as e:
+            results[i] = {"index": i, "error": str(e)}
+
+    try:
+        predictions = make_batch_prediction(valid_inputs)
+        future = prediction_writer.enqueue(
+            [_prediction_row(inp, res) for inp, res in zip(valid_inputs, predictions)]
+        )
+        if durable or future.done():
+            future.result()
+    except WriterOverloaded as e:
+        logger.error("❌ Batch predictions not stored: %s", e)
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error("❌ Batch prediction failed: %s", e)
+        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+
+    for i, prediction in zip(valid_indices, predictions):
+        results[i] = {"index": i, **prediction}
+
+    failed = len(items) - len(valid_indices)
+    logger.info("✅ Batch prediction made: %d scored, %d rejected.", len(valid_indices), failed)
+    return {"results": results, "succeeded": len(valid_indices), "failed": failed}
+
+def _score_stream_chunk(chunk: list, persist: bool):
+    """Validate and score one chunk of (index, record or parse error); returns (NDJSON text, scored count)."""
+    lines: List[dict] = [None] * len(chunk)
+    positions, valid_inputs = [], []
+    for pos, (index, record) in enumerate(chunk):
+        if isinstance(record, str):
+            lines[pos] = {"index": index, "error": record}
+            continue
+        try:
+            valid_inputs.append(PredictRequest(**record).dict())
+            positions.append(pos)
+        except ValidationError as e:
+            lines[pos] = {"index": index, "error": _format_validation_error(e)}
+
+    predictions = make_batch_prediction(valid_inputs)
+    if persist and valid_inputs:
+        prediction_writer.enqueue([_prediction_row(inp, res) for inp, res in zip(valid_inputs, predictions)])
+    for pos, prediction in zip(positions, predictions):
+        lines[pos] = {"index": chunk[pos][0], **prediction}
+    return "".join(json.dumps(line) + "\n" for line in lines), len(positions)
+
+@app.post("/predict-return/stream")
+async def predict_return_stream(request: Request, format: Optional[str] = None,
+                                chunk_size: int = STREAM_CHUNK_SIZE, persist: bool = True):
+    """Score an NDJSON or CSV request body while it uploads, streaming NDJSON results back per chunk.
+
+    Each output line is ``{"index", ...prediction}`` or ``{"index", "error"}``
+    in input order, followed by one ``{"summary": ...}`` line. Only one chunk
+    of input and output is held in memory at a time.
+    """
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    if format not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(STREAM_FORMATS)}")
+    if not 1 <= chunk_size <= MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"chunk_size must be between 1 and {MAX_BATCH_SIZE}")
+
+    async def results():
+        succeeded = failed = 0
+        error = None
+        try:
+            async for chunk in record_chunks(request.stream(), format, chunk_size):
+                lines, scored = await run_in_threadpool(_score_stream_chunk, chunk, persist)
+                succeeded += scored
+                failed += len(chunk) - scored
+                yield lines
+        except ClientDisconnect:
+            logger.warning("⚠️ Client disconnected from stream after %d records", succeeded + failed)
+            return
+        except (LineTooLong, WriterOverloaded) as e:
+            error = str(e)
+        except Exception as e:
+            logger.error("❌ Stream prediction failed: %s", e)
+            error = f"Stream prediction failed: {str(e)}"
+
+        summary = {"succeeded": succeeded, "failed": failed}
+        if error:
+            summary["error"] = error
+        logger.info("✅ Stream prediction made: %d scored, %d rejected.", succeeded, failed)
+        yield json.dumps({"summary": summary}) + "\n"
+
+    return DuplexStreamingResponse(results(), media_type="application/x-ndjson",
+                                   headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.post("/explain-return")
-def explain_return(data: PredictRequest):
+async def explain_return(data: PredictRequest):
     try:
         input_data = data.dict()
-        result = explain_prediction(input_data)
+        result = await explain_batcher.submit(input_data)
         logger.info("ℹ️ Explanation generated.")
         return result
     except Exception as e:
-        logger.error(f"❌ Explanation error: {str(e)}")
+        logger.error("❌ Explanation error: %s", e)
         raise HTTPException(status_code=500, detail=f"Explanation failed: {str(e)}")
 
+@app.post("/assess-return")
+async def assess_return(data: AssessRequest, durable: bool = False):
+    """Prediction, explanation, discount and recommendation from one encoded input."""
+    try:
+        input_data = data.dict()
+        result = await assess_batcher.submit(input_data)
+        await _persist_predictions([_prediction_row(input_data, result)], durable)
+
+        if data.include_discount:
+            # calculate_discount works on a percentage, as /get-discount callers send it
+            result["discount"] = calculate_discount(result["return_probability"] * 100, data.Product_Category)
+        if data.include_recommendation:
+            result["recommendation"] = recommend_alternative(data.Product_Category)
+
+        logger.info("✅ Assessment made successfully.")
+        return result
+    except WriterOverloaded as e:
+        logger.error("❌ Assessment not stored: %s", e)
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error("❌ Assessment failed: %s", e)
+        raise HTTPException(status_code=500, detail=f"Assessment failed: {str(e)}")
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: 200 once the model and explainer are loaded (and the worker pool is up), else 503."""
+    # In "lazy" mode (MODEL_WARMUP=0, no pool) the model loads on the first request instead
+    is_ready = warmup_state["status"] in ("ready", "lazy")
+    body = {"ready": is_ready, "warmup": warmup_state, **model_status()}
+    return JSONResponse(content=body, status_code=200 if is_ready else 503)
+
+@app.get("/batching/stats")
+def batching_stats():
+    return {
+        "predict": predict_batcher.stats(),
+        "explain": explain_batcher.stats(),
+        "assess": assess_batcher.stats(),
+        "model_pool": model_pool.stats() if model_pool is not None else None
+    }
+
+@app.get("/catalog/stats")
+def catalog_stats():
+    return catalog.stats()
+
+@app.get("/persistence/stats")
+def persistence_stats():
+    return prediction_writer.stats()
+
+@app.get("/explain-cache/stats")
+def explain_cache_stats():
+    return explanation_cache.stats()
+
+# The stats above are also exported as gauges on /metrics
+registry.add_collector("batcher", "Micro-batcher statistics (see /batching/stats).", "batcher",
+                       lambda: {"predict": predict_batcher.stats(), "explain": explain_batcher.stats(),
+                                "assess": assess_batcher.stats()})
+registry.add_collector("model_pool", "Model worker pool statistics.", None,
+                       lambda: model_pool.stats() if model_pool is not None else {})
+registry.add_collector("prediction_writer", "Write-behind buffer statistics (see /persistence/stats).", None,
+                       prediction_writer.stats)
+registry.add_collector("explain_cache", "Explanation cache statistics (see /explain-cache/stats).", None,
+                       explanation_cache.stats)
+registry.add_collector("catalog", "Product catalog statistics (see /catalog/stats).", None, catalog.stats)
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text exposition of request, stage and component metrics."""
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/get-discount")
 async def get_discount(data: dict):
     try:
         probability = float(data.get("return_probability", 0))
-        result = calculate_discount(probability)
-        logger.info(f"🎁 Discount logic executed for return_probability={probability}")
+        result = calculate_discount(probability, data.get("Product_Category"))
+        logger.info("🎁 Discount logic executed for return_probability=%s", probability)
         return result
-    except Exception as e:
-        logger.error(f"❌ Discount logic error: {str(e)}")
+    except Exception:
+        logger.exception("❌ Discount logic error")
         return {"discount_percent": 0, "reason": "Failed to calculate discount"}
 
 @app.post("/recommend")
@@ -182,83 +546,274 @@ async def recommend_product(data: dict):
     try:
         category = data.get("Product_Category")
         result = recommend_alternative(category)
-        logger.info(f"🧠 Recommendation made for category={category}")
+        logger.info("🧠 Recommendation made for category=%s", category)
         return result
-    except Exception as e:
-        logger.error(f"❌ Recommendation logic error: {str(e)}")
+    except Exception:
+        logger.exception("❌ Recommendation logic error")
         return {"recommended_product": None, "reason": "Failed to recommend"}
 
+def _check_log_level(level: Optional[str]):
+    if level and level.upper() not in LOG_LEVELS:
+        raise HTTPException(status_code=400, detail=f"level must be one of {', '.join(LOG_LEVELS)}")
+
 @app.get("/view-logs")
-def view_logs():
+def view_logs(lines: int = 200, level: Optional[str] = None, contains: Optional[str] = None):
+    """Last ``lines`` log lines (optionally filtered), read by seeking from the end of the file."""
+    _check_log_level(level)
     try:
         if not os.path.exists(LOG_PATH):
             raise FileNotFoundError("Log file not found.")
-        with open(LOG_PATH, "r", encoding="utf-8") as f:
-            content = f.read()
-        return JSONResponse(content={"logs": content})
-    except Exception as e:
-        logger.error(f"❌ Log file read error: {str(e)}")
+        found, end = tail_lines(LOG_PATH, lines, level, contains)
+        return JSONResponse(content={"logs": "\n".join(found), "lines": len(found), "next_offset": end})
+    except Exception:
+        logger.exception("❌ Log file read error")
         return JSONResponse(content={"logs": "Unable to read logs."})
 
+@app.get("/view-logs/range")
+def view_logs_range(offset: int = 0, max_bytes: int = 65536, level: Optional[str] = None,
+                    contains: Optional[str] = None):
+    """Whole log lines starting at byte ``offset``; pass ``next_offset`` back to page forward."""
+    _check_log_level(level)
+    if not os.path.exists(LOG_PATH):
+        raise HTTPException(status_code=404, detail="Log file not found.")
+    found, next_offset = read_range(LOG_PATH, offset, max_bytes, level, contains)
+    return {
+        "logs": "\n".join(line for line, _ in found),
+        "lines": len(found),
+        "offset": offset,
+        "next_offset": next_offset,
+        "eof": next_offset >= file_size(LOG_PATH)
+    }
+
+@app.get("/view-logs/stream")
+async def stream_logs(request: Request, offset: Optional[int] = None, level: Optional[str] = None,
+                      contains: Optional[str] = None):
+    """Server-Sent Events feed of new log lines; each event id is the byte offset to resume from."""
+    _check_log_level(level)
+    last_event_id = request.headers.get("last-event-id")
+    if offset is None and last_event_id and last_event_id.isdigit():
+        offset = int(last_event_id)
+    if offset is None:
+        # Pin the starting point now so lines written while the response starts aren't skipped
+        offset = file_size(LOG_PATH)
+
+    async def events():
+        async for line, line_end in follow(LOG_PATH, offset, level, contains):
+            if await request.is_disconnected():
+                break
+            if line is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"id: {line_end}\ndata: {line}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get("/stocks")
 def get_stocks(db: Session = Depends(get_db)):
+    """All stocks, with the ``version`` to send as ``expected_version`` in /stocks/adjust."""
     return db.query(Stock).all()
 
+def _keyset_response(query, model, limit: int, cursor: Optional[str], fields: Optional[str], order: str):
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+    try:
+        return keyset_page(query, model.id, select_columns(model, fields), limit, cursor, order == "desc")
+    except InvalidPageRequest as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/stocks/adjust")
+def adjust_stock(data: StockAdjustRequest, db: Session = Depends(get_db), user: str = Depends(get_current_user)):
+    """Apply a batch of ``{name, delta[, expected_version]}`` quantity changes atomically.
+
+    All or nothing: on an unknown name, a stale ``expected_version`` or a
+    quantity going negative (unless ``allow_negative``) nothing is applied and
+    the 409 lists the offending stocks. Returns the new quantity and version
+    of every stock touched.
+    """
+    if not data.adjustments:
+        raise HTTPException(status_code=400, detail="adjustments must not be empty")
+    if len(data.adjustments) > MAX_STOCK_ADJUSTMENTS:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(data.adjustments)} adjustments "
+                                                    f"(max {MAX_STOCK_ADJUSTMENTS})")
+    try:
+        with stage_timer("stock_adjust"):
+            result = adjust_stocks(db, [a.dict() for a in data.adjustments], data.allow_negative,
+                                   STOCK_ADJUST_RETRIES)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except StockAdjustmentRejected as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "problems": e.problems})
+    logger.info("📦 %d stock adjustments (%d stocks) applied by %s", result["applied"], len(result["stocks"]), user)
+    # Plain ints and strings: skip jsonable_encoder, which costs more than the update itself on big batches
+    return JSONResponse(content=result)
+
+@app.get("/stocks/page")
+def list_stocks(limit: int = 100, cursor: Optional[str] = None, fields: Optional[str] = None, order: str = "asc",
+                db: Session = Depends(get_db)):
+    """Stocks one page at a time; pass ``next_cursor`` back as ``cursor`` for the next page."""
+    return _keyset_response(db.query(Stock), Stock, limit, cursor, fields, order)
+
+@app.get("/predictions")
+async def list_predictions(limit: int = 100, cursor: Optional[str] = None, fields: Optional[str] = None,
+                           order: str = "desc", region: Optional[str] = None, category: Optional[str] = None,
+                           prediction: Optional[str] = None, min_probability: Optional[float] = None,
+                           max_probability: Optional[float] = None):
+    """Stored predictions, newest first by default, with keyset pagination.
+
+    ``fields`` is a comma-separated column list (``id`` is always included).
+    Deep pages cost the same as the first: each one seeks on the primary key
+    (or the region/category + id index) after the cursor.
+    """
+    if prediction is not None and prediction not in ("Yes", "No"):
+        raise HTTPException(status_code=400, detail="prediction must be Yes or No")
+    with stage_timer("predictions_page"):
+        return await run_read(_predictions_page, limit, cursor, fields, order, region, category, prediction,
+                              min_probability, max_probability)
+
+def _predictions_page(db, limit, cursor, fields, order, region, category, prediction, min_probability,
+                      max_probability):
+    query = db.query(ReturnPrediction)
+    if region and region != "All":
+        query = query.filter(ReturnPrediction.customer_region == region)
+    if category:
+        query = query.filter(ReturnPrediction.product_category == category)
+    if prediction:
+        query = query.filter(ReturnPrediction.prediction == prediction)
+    if min_probability is not None:
+        query = query.filter(ReturnPrediction.return_probability >= min_probability)
+    if max_probability is not None:
+        query = query.filter(ReturnPrediction.return_probability <= max_probability)
+    return _keyset_response(query, ReturnPrediction, limit, cursor, fields, order)
+
+@app.get("/predictions/export")
+def export_predictions(format: str = "parquet", after_id: Optional[int] = None,
+                       since: Optional[datetime.datetime] = None, user: str = Depends(get_current_user)):
+    """Download return_predictions (optionally only rows after ``after_id`` / created after ``since``).
+
+    Parquet, Arrow IPC stream or CSV, streamed in record batches in id order;
+    formats that need pyarrow fall back to CSV when it isn't installed.
+    """
+    try:
+        format = resolve_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    extension = {"parquet": "parquet", "arrow": "arrows", "csv": "csv"}[format]
+    logger.info("📤 Prediction export (%s) started by %s, after_id=%s since=%s", format, user, after_id, since)
+    return StreamingResponse(
+        stream_export(SessionLocal, format, after_id, since), media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="return_predictions.{extension}"'},
+    )
+
 @app.get("/visualize", response_class=HTMLResponse)
-async def visualize_chart():
+async def visualize_chart(format: str = "png"):
+    """Charts as embeddable PNG HTML (default), a standalone SVG, or the raw JSON series."""
+    if format not in CHART_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(CHART_FORMATS)}")
     try:
-        chart_html = stock_bar_chart()
-        logger.info("📊 Stock chart rendered.")
-        return HTMLResponse(content=chart_html)
+        # Rendering (DB reads, matplotlib) runs off the event loop and is cached per data version
+        chart = await run_in_threadpool(render_chart, format)
+        logger.info("📊 Stock chart rendered (%s).", format)
+        if format == "json":
+            return JSONResponse(content=chart)
+        if format == "svg":
+            return Response(content=chart, media_type="image/svg+xml")
+        return HTMLResponse(content=chart)
     except Exception as e:
-        logger.error(f"❌ Visualization error: {str(e)}")
+        logger.exception("❌ Visualization error")
         return HTMLResponse(content=f"<p>Error rendering chart: {str(e)}</p>")
 
+def _dashboard_rows(db, region, since):
+    return dashboard_summary(db, region, since), db.query(Stock).all()
+
 @app.get("/dashboard-data")
-def dashboard_data(region: Optional[str] = None, db: Session = Depends(get_db)):
+async def dashboard_data(region: Optional[str] = None, hours: Optional[int] = None):
+    if hours is not None and hours < 1:
+        raise HTTPException(status_code=400, detail="hours must be at least 1")
     try:
-        query = db.query(ReturnPrediction)
-        if region and region != "All":
-            query = query.filter(ReturnPrediction.customer_region == region)
-
-        total_returns = query.count()
-        high_risk_returns = query.filter(ReturnPrediction.return_probability > 0.7).count()
-
-        category_counts = query.with_entities(ReturnPrediction.product_category, func.count()).group_by(ReturnPrediction.product_category).all()
-        category_ratings = query.with_entities(ReturnPrediction.product_category, func.avg(ReturnPrediction.product_rating)).group_by(ReturnPrediction.product_category).all()
-        avg_return_probs = query.with_entities(ReturnPrediction.product_category, func.avg(ReturnPrediction.return_probability)).group_by(ReturnPrediction.product_category).all()
-
-        stock_data = db.query(Stock).all()
+        # Served from the rollup tables: O(regions x categories [x hours]), independent of history size
+        since = utcnow() - datetime.timedelta(hours=hours) if hours else None
+        with stage_timer("dashboard_query"):
+            summary, stock_data = await run_read(_dashboard_rows, region if region and region != "All" else None,
+                                                 since)
+        total_returns = summary["total_returns"]
+        high_risk_returns = summary["high_risk_returns"]
         stock_summary = {s.name: s.quantity for s in stock_data}
 
-        discount_summary = {}
-        try:
-            with open(PRODUCTS_FILE, "r") as f:
-                products = json.load(f)
-                for p in products:
-                    discount_summary[p["name"]] = {
-                        "discount_percent": p.get("discount_percent", 0),
-                        "reason": p.get("discount_reason", "N/A")
-                    }
-        except Exception as e:
-            logger.warning(f"⚠️ Couldn't read product file: {e}")
-            discount_summary = {}
+        discount_summary = catalog.discount_summary()
 
-        logger.info(f"📊 Dashboard loaded: Total={total_returns}, High Risk={high_risk_returns}")
+        logger.info("📊 Dashboard loaded: Total=%d, High Risk=%d", total_returns, high_risk_returns)
 
         return {
-            "total_returns": total_returns,
-            "high_risk_returns": high_risk_returns,
-            "return_by_category": {cat: count for cat, count in category_counts},
-            "average_rating_by_category": {cat: round(avg, 2) for cat, avg in category_ratings},
-            "average_return_probability_by_category": {cat: round(prob, 2) for cat, prob in avg_return_probs},
+            **summary,
             "stock_summary": stock_summary,
             "discount_summary_by_category": discount_summary
         }
-    except Exception as e:
-        logger.error(f"❌ Dashboard error: {str(e)}")
+    except Exception:
+        logger.exception("❌ Dashboard error")
         raise HTTPException(status_code=500, detail="Failed to load dashboard data")
 
+@app.get("/dashboard-data/timeseries")
+async def dashboard_timeseries(bucket: str = "hour", hours: Optional[int] = None,
+                               start: Optional[datetime.datetime] = None, end: Optional[datetime.datetime] = None,
+                               region: Optional[str] = None, category: Optional[str] = None):
+    """Hourly or daily prediction counts and mean return probability per category.
+
+    The range is ``[start, end)`` (naive times are UTC); by default it ends now
+    and covers ``hours`` hours (24 for hourly buckets, 30 days for daily).
+    """
+    if bucket not in TIMESERIES_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(TIMESERIES_BUCKETS)}")
+    if hours is not None and hours < 1:
+        raise HTTPException(status_code=400, detail="hours must be at least 1")
+    end = naive_utc(end) or utcnow()
+    start = naive_utc(start) or end - datetime.timedelta(hours=hours or (24 if bucket == "hour" else 24 * 30))
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if (end - start) / TIMESERIES_BUCKETS[bucket] > MAX_TIMESERIES_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Range too long: at most {MAX_TIMESERIES_BUCKETS} {bucket}s")
+
+    with stage_timer("dashboard_timeseries"):
+        return await run_read(prediction_timeseries, start, end, bucket,
+                              region if region and region != "All" else None, category)
+
+@app.get("/dashboard-data/consistency")
+def dashboard_consistency(db: Session = Depends(get_db)):
+    """Compare the dashboard rollups against a full aggregate of return_predictions."""
+    result = check_rollups(db)
+    if not result["consistent"]:
+        logger.warning("⚠️ Dashboard rollups out of sync in %d cells", len(result["mismatches"]))
+    return result
+
+@app.post("/dashboard-data/rebuild")
+def dashboard_rebuild(db: Session = Depends(get_db), user: str = Depends(get_current_user)):
+    """Recompute the dashboard rollups from scratch."""
+    try:
+        cells = rebuild_rollups(db)
+        hourly_cells = rebuild_hourly_rollups(db)
+        db.commit()
+        logger.info("📊 Dashboard rollups rebuilt by %s: %d cells, %d hourly cells", user, cells, hourly_cells)
+        return {"cells": cells, "hourly_cells": hourly_cells}
+    except Exception:
+        db.rollback()
+        logger.exception("❌ Rollup rebuild failed")
+        raise HTTPException(status_code=500, detail="Failed to rebuild dashboard rollups")
+
+@app.get("/model")
+def model_info():
+    """Live model version, load/warmup timings and reload history."""
+    return {**model_registry.stats(), "inference_backend": model_status()["inference_backend"]}
+
+@app.post("/admin/model/reload")
+async def reload_model(force: bool = False, user: str = Depends(get_current_user)):
+    """Load, validate and warm up the artifacts in model/, then swap them in without a restart."""
+    try:
+        result = await run_in_threadpool(model_registry.reload, force, f"admin:{user}")
+    except ModelValidationError as e:
+        raise HTTPException(status_code=422, detail=f"Model rejected, still serving the previous version: {e}")
+    logger.info("🧠 Model reload requested by %s: %s", user, result)
+    return result
+
 # Run locally
 if __name__ == "__main__":
     import uvicorn
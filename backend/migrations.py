@@ -0,0 +1,86 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Indexes models.py no longer declares, and the index that replaced each; the old
+# one is only dropped once its replacement exists, so lookups are never left unindexed
+SUPERSEDED_INDEXES = {
+    "ix_stocks_name": "uq_stocks_name",  # Stock.name index=True, replaced by the unique index
+}
+
+
+def add_missing_columns(engine, metadata):
+    """ALTER TABLE ... ADD COLUMN for model columns an existing database doesn't have yet.
+
+    Only nullable columns without server-side constraints are added, which is
+    what new columns in models.py are expected to be; existing rows get NULL.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                if not column.nullable:
+                    raise RuntimeError(f"Can't add NOT NULL column {table.name}.{column.name} automatically")
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def create_missing_indexes(engine, metadata):
+    """Create indexes declared in models.py that an existing database doesn't have yet.
+
+    A unique index that existing rows violate is skipped with an error logged,
+    so the app still starts; it is retried on the next start once fixed.
+    """
+    created = []
+    inspector = inspect(engine)
+    for table in metadata.sorted_tables:
+        present = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in present:
+                continue
+            try:
+                with engine.begin() as conn:
+                    index.create(bind=conn, checkfirst=True)
+            except IntegrityError as e:
+                logger.error("❌ Can't create unique index %s, existing rows have duplicates: %s", index.name, e.orig)
+                continue
+            created.append(index.name)
+    return created
+
+
+def drop_superseded_indexes(engine, metadata):
+    """Drop the SUPERSEDED_INDEXES whose replacement index is now in place."""
+    dropped = []
+    inspector = inspect(engine)
+    for table in metadata.sorted_tables:
+        present = {index["name"] for index in inspector.get_indexes(table.name)}
+        for old, replacement in SUPERSEDED_INDEXES.items():
+            if old in present and replacement in present:
+                with engine.begin() as conn:
+                    conn.execute(text(f"DROP INDEX {old}"))
+                dropped.append(old)
+    return dropped
+
+
+def upgrade_schema(engine, metadata):
+    """Create missing tables, add missing columns and indexes, drop superseded ones (idempotent)."""
+    metadata.create_all(bind=engine)
+    added = add_missing_columns(engine, metadata)
+    created = create_missing_indexes(engine, metadata)
+    dropped = drop_superseded_indexes(engine, metadata)
+    if added or created or dropped:
+        logger.info("🗄️ Schema upgraded: columns=%s indexes=%s dropped=%s",
+                    added or "-", created or "-", dropped or "-")
+    return {"columns_added": added, "indexes_created": created, "indexes_dropped": dropped}
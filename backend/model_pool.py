@@ -0,0 +1,181 @@
+import multiprocessing
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from logger_config import get_logger, setup_logging
+
+logger = get_logger(__name__)
+
+# Seconds start()/restart() wait for every worker to load the model
+WORKER_READY_TIMEOUT = 300
+
+
+def _init_worker(warmup: bool, expected_version, ready):
+    # Each worker loads trained_model.pkl (and with warmup, the TreeExplainer) once, from the same model dir,
+    # and checks it got the expected version before it takes any task. Spawned processes start with
+    # no handlers, so set up the same file/console logging as the API process first
+    setup_logging()
+    import predict_logic
+    if warmup:
+        predict_logic.warmup()
+    version = predict_logic.load_model().version
+    if expected_version is not None and version != expected_version:
+        if ready is not None:
+            ready.abort()  # fail start()/restart() now rather than at the timeout
+        raise RuntimeError(f"Worker loaded model {version}, expected {expected_version}")
+    if ready is not None:
+        # Hold this worker until all of them are up, so each ping goes to a different, freshly spawned process
+        try:
+            ready.wait(WORKER_READY_TIMEOUT)
+        except threading.BrokenBarrierError:
+            pass  # the pool is being discarded, or this worker replaced a recycled one after startup
+
+
+def _ping():
+    import predict_logic
+    return multiprocessing.current_process().pid, predict_logic.registry.current().version
+
+
+class ModelWorkerPool:
+    """Pool of worker processes that each hold their own copy of the model.
+
+    Forest and SHAP calls are submitted as (function, encoded array) pairs so
+    CPU-bound work runs outside the API process and off the GIL. Workers are
+    spawned fresh rather than forked, and with ``max_tasks_per_child`` set each
+    one is replaced after that many tasks (Python 3.11+).
+    """
+
+    def __init__(self, size: int, warmup: bool = True, max_tasks_per_child: int = 0):
+        self.size = size
+        self.warmup = warmup
+        self.max_tasks_per_child = max_tasks_per_child
+        self._executor = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+        self.started_at = None
+        self.model_versions = []
+        self.expected_version = None
+
+    def _create_executor(self, expected_version=None, ready=None):
+        kwargs = {
+            "max_workers": self.size,
+            "mp_context": multiprocessing.get_context("spawn"),
+            "initializer": _init_worker,
+            "initargs": (self.warmup, expected_version, ready),
+        }
+        if self.max_tasks_per_child > 0:
+            if sys.version_info >= (3, 11):
+                kwargs["max_tasks_per_child"] = self.max_tasks_per_child
+            else:
+                logger.warning("⚠️ Worker recycling needs Python 3.11+; ignoring max_tasks_per_child")
+        return ProcessPoolExecutor(**kwargs)
+
+    def _spawn_ready(self, expected_version):
+        """New executor whose ``size`` workers have all loaded the model (and passed the version check)."""
+        ready = multiprocessing.get_context("spawn").Barrier(self.size + 1)
+        executor = self._create_executor(expected_version, ready)
+        # No worker can finish a task while the others are still loading, so the executor spawns one per ping
+        pings = [executor.submit(_ping) for _ in range(self.size)]
+        try:
+            ready.wait(WORKER_READY_TIMEOUT)
+        except threading.BrokenBarrierError:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise RuntimeError(f"Model workers failed to start (expected model {expected_version}, "
+                               f"timeout {WORKER_READY_TIMEOUT}s); see the worker errors above") from None
+        ready.abort()  # workers spawned later (recycling) don't wait for the others
+        workers = dict(f.result() for f in pings)
+        return executor, workers
+
+    def start(self, expected_version: str = None):
+        """Spawn every worker and wait until each has loaded the model (``expected_version``, if given)."""
+        started = time.perf_counter()
+        with self._lock:
+            executor = self._executor
+        if executor is None:
+            executor, workers = self._spawn_ready(expected_version)
+            with self._lock:
+                self._executor = executor
+                self.expected_version = expected_version
+        else:
+            workers = dict(f.result() for f in [executor.submit(_ping) for _ in range(self.size)])
+        self.model_versions = sorted(set(workers.values()))
+        self.started_at = time.time()
+        logger.info("🧵 Model worker pool ready: %d processes in %.2fs", len(workers), time.perf_counter() - started)
+
+    @property
+    def running(self):
+        return self._executor is not None
+
+    def restart(self, expected_version: str = None):
+        """Replace every worker (e.g. after a model swap) without dropping queued work.
+
+        The new workers are spawned and warmed up first; tasks already handed to
+        the old executor still run to completion on the old workers. With
+        ``expected_version``, the new workers must all have loaded that model
+        version or the old pool is kept and RuntimeError is raised.
+        """
+        started = time.perf_counter()
+        executor, workers = self._spawn_ready(expected_version)
+        with self._lock:
+            self.model_versions = sorted(set(workers.values()))
+            self.expected_version = expected_version
+            old, self._executor = self._executor, executor
+            self.restarts += 1
+        if old is not None:
+            old.shutdown(wait=False)
+        logger.info("🧵 Model worker pool restarted: %d processes in %.2fs", len(workers), time.perf_counter() - started)
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if self._executor is None:
+                raise RuntimeError("Model worker pool is not running")
+            try:
+                future = self._executor.submit(fn, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); replace the whole pool once and retry
+                logger.error("❌ Model worker pool broken, restarting")
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._create_executor(self.expected_version)
+                self.restarts += 1
+                future = self._executor.submit(fn, *args)
+            self.submitted += 1
+        future.add_done_callback(self._on_done)
+        return future
+
+    def run(self, fn, *args):
+        """Submit and block the calling thread (never the event loop) until done."""
+        return self.submit(fn, *args).result()
+
+    def _on_done(self, future):
+        with self._lock:
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+            logger.info("🧵 Model worker pool shut down")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": self._executor is not None,
+                "size": self.size,
+                "max_tasks_per_child": self.max_tasks_per_child,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "in_flight": self.submitted - self.completed - self.failed,
+                "restarts": self.restarts,
+                "model_versions": list(self.model_versions),
+            }
@@ -0,0 +1,287 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from feature_encoder import FeatureEncoder
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+MODEL_FILE = "trained_model.pkl"
+COLUMNS_FILE = "input_columns.json"
+LABEL_ENCODER_FILE = "label_encoder.pkl"
+
+# Numeric request fields the API can fill in; any other non-categorical column means a schema mismatch
+REQUEST_NUMERIC_FIELDS = ("Past_Return_Count", "Product_Rating", "Delivery_Time_Days")
+
+
+class ModelValidationError(Exception):
+    """Raised when a candidate model's artifacts are inconsistent or fail warmup."""
+
+
+def artifact_version(*paths):
+    """Short content hash identifying a set of model artifacts."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+class ModelBundle:
+    """One loaded model version: forest, columns, encoder and (lazily) its SHAP explainer.
+
+    A bundle is never modified after it is published, apart from building the
+    explainer on first use, so a request that picked it up keeps using the
+    same version end to end even if a newer one is swapped in meanwhile.
+    """
+
+    def __init__(self, version, model, columns, label_encoder, forest_engine=None, source=None):
+        self.version = version
+        self.model = model
+        self.columns = columns
+        self.label_encoder = label_encoder
+        self.encoder = FeatureEncoder(columns)
+        self.forest_engine = forest_engine
+        self.source = source
+        self.loaded_at = time.time()
+        self.timings = {}
+        self._explainer = None
+        self._explainer_lock = threading.Lock()
+
+    @property
+    def explainer_loaded(self):
+        return self._explainer is not None
+
+    def explainer(self):
+        if self._explainer is None:
+            with self._explainer_lock:
+                if self._explainer is None:
+                    started = time.perf_counter()
+                    import shap
+                    self._explainer = shap.TreeExplainer(self.model)
+                    self.timings["explainer_seconds"] = round(time.perf_counter() - started, 3)
+        return self._explainer
+
+
+def _artifact_paths(model_dir):
+    return os.path.join(model_dir, MODEL_FILE), os.path.join(model_dir, COLUMNS_FILE)
+
+
+def validate_schema(model, columns):
+    """Check the column list against the forest before it can serve traffic."""
+    if not isinstance(columns, list) or not all(isinstance(c, str) for c in columns):
+        raise ModelValidationError(f"{COLUMNS_FILE} must be a list of column names")
+    if len(set(columns)) != len(columns):
+        raise ModelValidationError(f"{COLUMNS_FILE} contains duplicate columns")
+
+    model_columns = getattr(model, "feature_names_in_", None)
+    if model_columns is not None and list(model_columns) != columns:
+        raise ModelValidationError(f"{COLUMNS_FILE} does not match the columns the model was trained on")
+    if getattr(model, "n_features_in_", len(columns)) != len(columns):
+        raise ModelValidationError(f"Model expects {model.n_features_in_} features, {COLUMNS_FILE} lists {len(columns)}")
+    if len(getattr(model, "classes_", [])) != 2:
+        raise ModelValidationError("Model must be a binary classifier")
+
+    unknown = [column for column, _ in FeatureEncoder(columns).numeric_fields if column not in REQUEST_NUMERIC_FIELDS]
+    if unknown:
+        raise ModelValidationError(f"Model uses columns the API can't provide: {', '.join(unknown)}")
+
+
+def load_bundle(model_dir: str, inference_backend: str = "sklearn"):
+    """Load and schema-check the artifacts in ``model_dir`` into a new ModelBundle."""
+    import joblib
+
+    started = time.perf_counter()
+    model_path, columns_path = _artifact_paths(model_dir)
+    # Hash first: if the files change while we load, the watcher sees a new version and retries
+    version = artifact_version(model_path, columns_path)
+    model = joblib.load(model_path)
+
+    # Load label encoder
+    try:
+        label_encoder = joblib.load(os.path.join(model_dir, LABEL_ENCODER_FILE))
+    except FileNotFoundError:
+        from sklearn.preprocessing import LabelEncoder
+        label_encoder = LabelEncoder()
+        label_encoder.classes_ = np.array(['No', 'Yes'])
+
+    # Load expected columns
+    with open(columns_path, "r") as f:
+        columns = json.load(f)
+
+    validate_schema(model, columns)
+    # Column order is fixed by input_columns.json and was checked above, so the
+    # request path can hand the forest plain arrays instead of DataFrames.
+    if getattr(model, "feature_names_in_", None) is not None:
+        del model.feature_names_in_
+
+    forest_engine = None
+    if inference_backend == "flat":
+        from forest_engine import FlatForest
+        forest_engine = FlatForest(model)
+
+    bundle = ModelBundle(version, model, columns, label_encoder, forest_engine, source=model_dir)
+    bundle.timings["model_seconds"] = round(time.perf_counter() - started, 3)
+    return bundle
+
+
+class ModelRegistry:
+    """Holds the live ModelBundle and replaces it without a restart.
+
+    ``reload`` loads the artifacts in ``model_dir`` into a new bundle,
+    validates the column schema, runs ``warmup(bundle)`` (synthetic
+    predictions and explanations) and only then publishes it. Publishing is a
+    single reference assignment, so requests in flight finish on the bundle
+    they started with. A candidate that fails any step is discarded and the
+    current version keeps serving.
+
+    ``start_watcher`` polls the artifact files and reloads once a change has
+    been stable for one poll interval (so half-copied files are not loaded).
+    ``before_swap``/``after_swap`` hooks run in the reloading thread around
+    the cutover.
+    """
+
+    def __init__(self, model_dir: str, inference_backend: str = "sklearn", warmup=None, history_size: int = 10):
+        self.model_dir = model_dir
+        self.inference_backend = inference_backend
+        self.warmup = warmup
+        self.history_size = history_size
+        self.before_swap = []
+        self.after_swap = []
+        self._current = None
+        self._load_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop_watching = threading.Event()
+        self.history = []
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error = None
+
+    def current(self):
+        """The live bundle, loading the initial version on first use (without warmup)."""
+        bundle = self._current
+        if bundle is None:
+            with self._load_lock:
+                if self._current is None:
+                    self._publish(load_bundle(self.model_dir, self.inference_backend), reason="initial")
+                bundle = self._current
+        return bundle
+
+    @property
+    def loaded(self):
+        return self._current is not None
+
+    def _publish(self, bundle, reason):
+        previous = self._current
+        for hook in self.before_swap:
+            hook(bundle, previous)
+        self._current = bundle
+        self.history.append({"version": bundle.version, "reason": reason, "at": bundle.loaded_at, **bundle.timings})
+        del self.history[:-self.history_size]
+        logger.info("🧠 Model %s live (%s, previous: %s)", bundle.version, reason,
+                    previous.version if previous else None)
+        for hook in self.after_swap:
+            try:
+                hook(bundle, previous)
+            except Exception as e:
+                logger.error("❌ Post-swap hook failed: %s", e)
+
+    def reload(self, force: bool = False, reason: str = "manual"):
+        """Load, validate, warm up and swap in the artifacts on disk.
+
+        Returns ``{"reloaded": bool, "version": ..., "previous": ...}``; raises
+        ModelValidationError (and keeps the current model) if the candidate is bad.
+        """
+        with self._reload_lock:
+            previous = self._current
+            try:
+                model_path, columns_path = _artifact_paths(self.model_dir)
+                if not force and previous is not None and artifact_version(model_path, columns_path) == previous.version:
+                    return {"reloaded": False, "version": previous.version, "previous": previous.version}
+
+                started = time.perf_counter()
+                candidate = load_bundle(self.model_dir, self.inference_backend)
+                if self.warmup is not None:
+                    self.warmup(candidate)
+                candidate.timings["warmup_seconds"] = round(time.perf_counter() - started, 3)
+            except ModelValidationError as e:
+                self._record_failure(e)
+                raise
+            except Exception as e:
+                self._record_failure(e)
+                raise ModelValidationError(f"Candidate model failed to load: {e}") from e
+
+            self.reloads += 1
+            with self._load_lock:
+                self._publish(candidate, reason)
+            self.last_error = None
+            return {"reloaded": True, "version": candidate.version, "previous": previous.version if previous else None}
+
+    def _record_failure(self, error):
+        self.failed_reloads += 1
+        self.last_error = str(error)
+        logger.error("❌ Model reload rejected, keeping the current version: %s", error)
+
+    def _signature(self):
+        signature = []
+        for path in _artifact_paths(self.model_dir):
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def start_watcher(self, interval: float):
+        if interval <= 0 or self._watcher is not None:
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        if self._watcher is None:
+            return
+        self._stop_watching.set()
+        self._watcher.join(timeout=10)
+        self._watcher = None
+
+    def _watch(self, interval):
+        seen = self._signature()
+        pending = None
+        while not self._stop_watching.wait(interval):
+            signature = self._signature()
+            if signature == seen or None in signature:
+                pending = None
+                continue
+            if signature != pending:
+                # Changed since the last poll: wait one more interval for the copy to finish
+                pending = signature
+                continue
+            seen, pending = signature, None
+            try:
+                self.reload(reason="watcher")
+            except ModelValidationError:
+                pass
+
+    def stats(self):
+        bundle = self._current
+        return {
+            "model_dir": self.model_dir,
+            "loaded": bundle is not None,
+            "version": bundle.version if bundle else None,
+            "loaded_at": bundle.loaded_at if bundle else None,
+            "explainer_loaded": bundle.explainer_loaded if bundle else False,
+            "watching": self._watcher is not None,
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads,
+            "last_error": self.last_error,
+            "history": list(self.history),
+        }
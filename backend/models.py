@@ -1,17 +1,28 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index, UniqueConstraint
 from database import Base
 
 # Stock Table
 class Stock(Base):
     __tablename__ = "stocks"
+    # Adjustments look stocks up by name, so names must be unique
+    __table_args__ = (Index("uq_stocks_name", "name", unique=True),)
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
+    name = Column(String)
     quantity = Column(Integer)
+    # Bumped by every adjustment, for optimistic conflict checks; NULL (treated as 0) for rows never adjusted
+    version = Column(Integer)
 
 # ReturnPrediction Table
 class ReturnPrediction(Base):
     __tablename__ = "return_predictions"
+    # Time-range queries and keyset pages (ordered by id) filtered by region or category
+    __table_args__ = (
+        Index("ix_return_predictions_region_created_at", "customer_region", "created_at"),
+        Index("ix_return_predictions_category_created_at", "product_category", "created_at"),
+        Index("ix_return_predictions_region_id", "customer_region", "id"),
+        Index("ix_return_predictions_category_id", "product_category", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     product_category = Column(String)
@@ -23,3 +34,40 @@ class ReturnPrediction(Base):
     delivery_time_days = Column(Integer)
     prediction = Column(String)
     return_probability = Column(Float)
+    # Version (artifact hash) of the model that produced the prediction; NULL for rows stored before it was tracked
+    model_version = Column(String, index=True)
+    # When the prediction was stored (naive UTC); NULL for rows stored before it was tracked
+    created_at = Column(DateTime, index=True)
+
+# Per (region, category) aggregates of return_predictions, kept in step with inserts
+class ReturnRollup(Base):
+    __tablename__ = "return_rollups"
+    __table_args__ = (UniqueConstraint("customer_region", "product_category", name="uq_return_rollups_region_category"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    customer_region = Column(String, nullable=False)
+    product_category = Column(String, nullable=False)
+    prediction_count = Column(Integer, nullable=False, default=0)
+    high_risk_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Float, nullable=False, default=0.0)
+    probability_sum = Column(Float, nullable=False, default=0.0)
+    # Rows with a product_rating (the divisor for average ratings); NULL until rebuilt on databases that predate it
+    rating_count = Column(Integer, default=0)
+
+# Per (hour, region, category) aggregates of return_predictions, for time-range dashboards
+class ReturnHourlyRollup(Base):
+    __tablename__ = "return_hourly_rollups"
+    __table_args__ = (
+        UniqueConstraint("bucket_start", "customer_region", "product_category", name="uq_return_hourly_rollups_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    bucket_start = Column(DateTime, nullable=False)
+    customer_region = Column(String, nullable=False)
+    product_category = Column(String, nullable=False)
+    prediction_count = Column(Integer, nullable=False, default=0)
+    high_risk_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Float, nullable=False, default=0.0)
+    probability_sum = Column(Float, nullable=False, default=0.0)
+    # Rows with a product_rating (the divisor for average ratings); NULL until rebuilt on databases that predate it
+    rating_count = Column(Integer, default=0)
@@ -1,10 +1,11 @@
-import joblib
-import pandas as pd
 import numpy as np
-import json
 import os
-import shap
-from logger_config import logger  # ✅ Logging added
+from logger_config import get_logger  # ✅ Logging added
+from explanation_cache import ExplanationCache
+from model_registry import ModelRegistry, ModelValidationError
+from metrics import stage_timer
+
+logger = get_logger(__name__)
 
 # Temporary fix for SHAP compatibility
 if not hasattr(np, 'bool'):
@@ -12,108 +13,235 @@ if not hasattr(np, 'bool'):
 
 # --- Resolve paths ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-model_dir = os.path.join(BASE_DIR, "model")
+model_dir = os.getenv("MODEL_DIR", os.path.join(BASE_DIR, "model"))
+
+# --- Inference backend ---
+# "sklearn" calls model.predict_proba; "flat" compiles the forest into a FlatForest at load time
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "sklearn")
+if INFERENCE_BACKEND not in ("sklearn", "flat"):
+    raise ValueError(f"Unknown INFERENCE_BACKEND: {INFERENCE_BACKEND}")
+
+# --- Explanation cache ---
+EXPLAIN_CACHE_MAX_ENTRIES = int(os.getenv("EXPLAIN_CACHE_MAX_ENTRIES", "10000"))
+EXPLAIN_CACHE_TTL_SECONDS = float(os.getenv("EXPLAIN_CACHE_TTL_SECONDS", "3600"))
+
+# Synthetic rows pushed through a candidate model before it goes live
+WARMUP_ROWS = int(os.getenv("MODEL_WARMUP_ROWS", "64"))
+
+explanation_cache = ExplanationCache(EXPLAIN_CACHE_MAX_ENTRIES, EXPLAIN_CACHE_TTL_SECONDS)
+
+def warm_bundle(bundle, rows: int = WARMUP_ROWS, seed: int = 0):
+    """Score and explain synthetic rows with ``bundle``; raise ModelValidationError on bad output."""
+    rng = np.random.default_rng(seed)
+    records = []
+    for _ in range(max(1, rows)):
+        record = {field: rng.choice(list(values) or ["Unknown"]) for field, values in bundle.encoder.category_index.items()}
+        record.update(Past_Return_Count=int(rng.integers(0, 10)), Product_Rating=float(rng.integers(2, 11) / 2),
+                      Delivery_Time_Days=int(rng.integers(1, 15)))
+        records.append(record)
+    X = bundle.encoder.encode_many(records)
+
+    probs = _local_positive_proba(X, bundle)
+    if probs.shape != (len(records),) or not np.all(np.isfinite(probs)) or probs.min() < 0 or probs.max() > 1:
+        raise ModelValidationError("Warmup predictions are not probabilities")
+    contributions = _local_shap_contributions(X, bundle)
+    if contributions.shape != X.shape:
+        raise ModelValidationError(f"Warmup SHAP output has shape {contributions.shape}, expected {X.shape}")
+
+# --- Model registry ---
+# The live model is registry.current(); a request takes it once and uses that
+# bundle throughout, so a hot swap never mixes two versions in one response.
+registry = ModelRegistry(model_dir, INFERENCE_BACKEND, warmup=warm_bundle)
+registry.after_swap.append(lambda bundle, previous: explanation_cache.set_model_version(bundle.version))
+
+def load_model():
+    """Return the live ModelBundle, loading the initial version if needed."""
+    return registry.current()
 
-# --- Load model and explainer ---
-model = joblib.load(os.path.join(model_dir, "trained_model.pkl"))
-explainer = shap.TreeExplainer(model)
+def load_explainer():
+    return registry.current().explainer()
 
-# Load label encoder
-try:
-    label_encoder = joblib.load(os.path.join(model_dir, "label_encoder.pkl"))
-except FileNotFoundError:
-    from sklearn.preprocessing import LabelEncoder
-    label_encoder = LabelEncoder()
-    label_encoder.classes_ = np.array(['No', 'Yes'])
+def model_status():
+    bundle = registry.current() if registry.loaded else None
+    return {
+        "model_loaded": bundle is not None,
+        "explainer_loaded": bundle.explainer_loaded if bundle else False,
+        "model_version": bundle.version if bundle else None,
+        "inference_backend": INFERENCE_BACKEND,
+        **(bundle.timings if bundle else {}),
+    }
+
+# Optional ModelWorkerPool; when set, forest and SHAP work runs in its worker processes
+model_executor = None
+
+def set_model_executor(executor):
+    global model_executor
+    model_executor = executor
+
+def predict_positive_proba(X, bundle=None):
+    """Return the "Yes" probability for each encoded row using the configured backend."""
+    with stage_timer("predict"):
+        if model_executor is not None:
+            return model_executor.run(_local_positive_proba, X)
+        return _local_positive_proba(X, bundle)
 
-# Load expected columns
-with open(os.path.join(model_dir, "input_columns.json"), "r") as f:
-    expected_columns = json.load(f)
+def shap_contributions(X, bundle=None):
+    """Return the (n_rows, n_features) SHAP contributions towards "Yes" for encoded rows."""
+    with stage_timer("shap"):
+        if model_executor is not None:
+            return model_executor.run(_local_shap_contributions, X)
+        return _local_shap_contributions(X, bundle)
+
+def _local_positive_proba(X, bundle=None):
+    bundle = bundle or registry.current()
+    if bundle.forest_engine is not None:
+        return bundle.forest_engine.predict_proba(X)[:, 1]
+    return bundle.model.predict_proba(X)[:, 1]
+
+def _local_shap_contributions(X, bundle=None):
+    bundle = bundle or registry.current()
+    return positive_class_contributions(bundle.explainer().shap_values(X))
+
+def warmup():
+    """Load the live model and its explainer and run synthetic rows through both."""
+    warm_bundle(registry.current())
 
 # --- Prediction Function ---
 def make_prediction(data: dict):
     logger.info("🧠 Running prediction logic")
-    df = pd.DataFrame([data])
-
-    # One-hot encode
-    categorical_mappings = {
-        'Product_Category': ['Laptops', 'Shirts', 'Shoes'],
-        'Product_Size': ['L', 'M', 'S'],
-        'Customer_Region': ['East', 'North', 'South', 'West'],
-        'Customer_Age_Group': ['18-25', '26-35', '36-45', '46-60']
-    }
-    df_encoded = pd.get_dummies(df, columns=list(categorical_mappings.keys()))
+    bundle = registry.current()
+    with stage_timer("encode"):
+        X = bundle.encoder.encode(data)
 
-    # Add missing expected columns
-    for col in expected_columns:
-        if col not in df_encoded.columns:
-            df_encoded[col] = 0
-    df_encoded = df_encoded[expected_columns]
-
-    prob = model.predict_proba(df_encoded)[0][1]
+    prob = predict_positive_proba(X, bundle)[0]
     prediction = "Yes" if prob > 0.5 else "No"
 
-    logger.info(f"✅ Prediction = {prediction} | Probability = {round(prob, 3)}")
+    logger.info("✅ Prediction = %s | Probability = %.3f", prediction, prob)
+
+    return format_prediction(prob, bundle.version)
+
+# --- Batch Prediction ---
+def make_batch_prediction(records: list):
+    """Score many validated records with one encoding pass and one predict_proba call."""
+    if not records:
+        return []
+    logger.info("🧠 Running batch prediction logic for %d records", len(records))
+    bundle = registry.current()
+    with stage_timer("encode"):
+        X = bundle.encoder.encode_many(records)
 
+    probs = predict_positive_proba(X, bundle)
+    return [format_prediction(prob, bundle.version) for prob in probs]
+
+def format_prediction(prob, model_version=None):
     return {
         "return_probability": round(float(prob), 3),
-        "prediction": prediction
+        "prediction": "Yes" if prob > 0.5 else "No",
+        "model_version": model_version
     }
 
 # --- SHAP Explanation ---
+FALLBACK_REASONS = [
+    "Product rating affects return likelihood",
+    "Delivery time influences customer satisfaction",
+    "Past return history is a key indicator"
+]
+
 def explain_prediction(data: dict):
     logger.info("🔍 SHAP explanation requested")
+    return explain_batch([data])[0]
+
+def explain_batch(records: list):
+    """Explain many records with one SHAP call for the rows not already cached."""
+    if not records:
+        return []
+    bundle = registry.current()
+    with stage_timer("encode"):
+        X = bundle.encoder.encode_many(records)
+    return [{"top_reasons": reasons} for reasons in explain_encoded(X, bundle)]
+
+def explain_encoded(X, bundle=None):
+    """Top reasons for each already-encoded row; one SHAP call covers every cache miss."""
     try:
-        df = pd.DataFrame([data])
-        categorical_mappings = {
-            'Product_Category': ['Laptops', 'Shirts', 'Shoes'],
-            'Product_Size': ['L', 'M', 'S'],
-            'Customer_Region': ['East', 'North', 'South', 'West'],
-            'Customer_Age_Group': ['18-25', '26-35', '36-45', '46-60']
-        }
-        df_encoded = pd.get_dummies(df, columns=list(categorical_mappings.keys()))
-
-        for col in expected_columns:
-            if col not in df_encoded.columns:
-                df_encoded[col] = 0
-        df_encoded = df_encoded[expected_columns]
-
-        shap_values = explainer.shap_values(df_encoded)
-
-        if isinstance(shap_values, list) and len(shap_values) == 2:
-            shap_contributions = shap_values[1][0]
-        elif isinstance(shap_values, np.ndarray) and shap_values.ndim == 2:
-            shap_contributions = shap_values[0]
-        else:
-            raise ValueError("Unsupported SHAP output format")
-
-        abs_vals = np.abs(shap_contributions)
-        top_indices = np.argsort(abs_vals)[-3:][::-1]
-
-        top_reasons = []
-        for idx in top_indices:
-            feature_name = expected_columns[idx]
-            impact = shap_contributions[idx]
-            clean_name = format_feature_name(feature_name)
-            direction = "increases" if impact > 0 else "decreases"
-            impact_strength = "strongly" if abs(impact) > 0.1 else "slightly"
-            top_reasons.append(f"{clean_name} {impact_strength} {direction} return likelihood")
-
-        logger.info("ℹ️ Explanation generated successfully")
-        return {
-            "top_reasons": top_reasons
-            # Optional: "raw_shap": shap_contributions.tolist()
-        }
+        bundle = bundle or registry.current()
+        keys = [explanation_cache.key(row, bundle.version) for row in X]
+        reasons = [explanation_cache.get(key) for key in keys]
+        missing = [i for i, cached in enumerate(reasons) if cached is None]
+
+        if missing:
+            contributions = shap_contributions(X[missing], bundle)
+            for row, i in enumerate(missing):
+                reasons[i] = tuple(top_reasons_from_contributions(contributions[row], columns=bundle.columns))
+                explanation_cache.put(keys[i], reasons[i])
+
+        logger.info("ℹ️ Explanation generated successfully (%d/%d from cache)", len(X) - len(missing), len(X))
+        return [list(top_reasons) for top_reasons in reasons]
 
     except Exception as e:
-        logger.warning(f"⚠️ SHAP explanation fallback due to error: {str(e)}")
-        return {
-            "top_reasons": [
-                "Product rating affects return likelihood",
-                "Delivery time influences customer satisfaction",
-                "Past return history is a key indicator"
-            ]
-        }
+        logger.warning("⚠️ SHAP explanation fallback due to error: %s", e)
+        return [list(FALLBACK_REASONS) for _ in range(len(X))]
+
+# --- Combined Assessment ---
+def assess_batch(records: list):
+    """Predict and (optionally) explain each record from a single encoding.
+
+    A record is skipped by SHAP when it carries ``include_explanation=False``.
+    """
+    if not records:
+        return []
+    bundle = registry.current()
+    with stage_timer("encode"):
+        X = bundle.encoder.encode_many(records)
+    results = [format_prediction(prob, bundle.version) for prob in predict_positive_proba(X, bundle)]
+
+    explain_rows = [i for i, record in enumerate(records) if record.get("include_explanation", True)]
+    if explain_rows:
+        for i, top_reasons in zip(explain_rows, explain_encoded(X[explain_rows], bundle)):
+            results[i]["top_reasons"] = top_reasons
+    return results
+
+# --- Bulk Scoring ---
+def score_columns(data, n_rows: int, explain: bool = False):
+    """Score column-oriented input (e.g. a DataFrame chunk) in this process.
+
+    Returns ``(probabilities, top_reasons or None, model_version)``. Used by
+    score_file.py, whose worker processes each load their own model; rows
+    are mostly unique there, so the explanation cache is bypassed.
+    """
+    bundle = registry.current()
+    X = bundle.encoder.encode_columns(data, n_rows)
+    probs = _local_positive_proba(X, bundle)
+    reasons = None
+    if explain and n_rows:
+        contributions = _local_shap_contributions(X, bundle)
+        reasons = [top_reasons_from_contributions(row, columns=bundle.columns) for row in contributions]
+    return probs, reasons, bundle.version
+
+def positive_class_contributions(shap_values):
+    """Return the (n_rows, n_features) SHAP contributions towards the "Yes" class."""
+    if isinstance(shap_values, list) and len(shap_values) == 2:
+        return np.asarray(shap_values[1])
+    if isinstance(shap_values, np.ndarray) and shap_values.ndim == 3:
+        # Newer SHAP releases return (n_rows, n_features, n_classes)
+        return shap_values[:, :, 1]
+    if isinstance(shap_values, np.ndarray) and shap_values.ndim == 2:
+        return shap_values
+    raise ValueError("Unsupported SHAP output format")
+
+def top_reasons_from_contributions(shap_contributions, top_n: int = 3, columns=None):
+    columns = columns or registry.current().columns
+    abs_vals = np.abs(shap_contributions)
+    top_indices = np.argsort(abs_vals)[-top_n:][::-1]
+
+    top_reasons = []
+    for idx in top_indices:
+        feature_name = columns[idx]
+        impact = shap_contributions[idx]
+        clean_name = format_feature_name(feature_name)
+        direction = "increases" if impact > 0 else "decreases"
+        impact_strength = "strongly" if abs(impact) > 0.1 else "slightly"
+        top_reasons.append(f"{clean_name} {impact_strength} {direction} return likelihood")
+    return top_reasons
 
 # --- Helper to Clean Feature Names ---
 def format_feature_name(feature_name):
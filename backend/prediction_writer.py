@@ -0,0 +1,202 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from logger_config import get_logger
+from rollups import record_predictions
+
+logger = get_logger(__name__)
+
+
+class WriterOverloaded(Exception):
+    """Raised when the write-behind buffer stays full for longer than the enqueue timeout."""
+
+
+class PredictionWriter:
+    """Write-behind buffer that persists ReturnPrediction rows in bulk.
+
+    ``enqueue`` puts a call's row dicts on a bounded queue as one item and
+    returns a Future that resolves once all of them are committed (or fails
+    if they aren't), so callers choose between fire-and-forget and waiting
+    for durability. A background thread flushes when ``batch_size`` rows are
+    buffered or ``flush_interval_ms`` has passed since the first buffered
+    call, using one bulk insert (plus the matching dashboard rollup
+    increments) per flush; a call's rows always land in the same flush. A
+    full buffer (``max_queue`` rows) blocks producers for up to
+    ``enqueue_timeout`` seconds, then raises WriterOverloaded with nothing
+    of that call queued. ``stop`` flushes everything still buffered.
+
+    When disabled, ``enqueue`` writes the rows inline and returns a finished Future.
+    """
+
+    def __init__(self, session_factory, max_queue: int = 10000, batch_size: int = 500,
+                 flush_interval_ms: float = 200, enqueue_timeout: float = 1.0, enabled: bool = True):
+        self.session_factory = session_factory
+        self.max_queue = max_queue
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.001, flush_interval_ms / 1000)
+        self.enqueue_timeout = enqueue_timeout
+        self.enabled = enabled
+        # Calls (rows, future); capacity is counted in rows, reserved under _capacity
+        self._queue = queue.Queue()
+        self._capacity = threading.Condition()
+        self._buffered_rows = 0
+        self._thread = None
+        self._stopping = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.enqueued = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_rows = 0
+        self.flush_seconds_total = 0.0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="prediction-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30):
+        """Stop accepting work and flush whatever is still buffered."""
+        if self._thread is None:
+            return
+        with self._capacity:
+            self._stopping.set()
+            self._capacity.notify_all()
+        self._thread.join(timeout)
+        self._thread = None
+        # Whatever the thread didn't get to (e.g. the join timed out) is written here
+        self._drain()
+
+    def enqueue(self, rows: list):
+        future = Future()
+        if not rows:
+            future.set_result(0)
+            return future
+        if self._thread is None or self._stopping.is_set():
+            self._flush([(rows, future)])
+            return future
+
+        # Reserve room for the whole call before queueing any of it; a call larger than
+        # the buffer is admitted once the buffer is empty. Checking _stopping and queueing
+        # under the same lock stop() sets it with means no call is queued after the thread exits
+        with self._capacity:
+            has_room = self._capacity.wait_for(
+                lambda: self._stopping.is_set() or self._buffered_rows == 0
+                or self._buffered_rows + len(rows) <= self.max_queue,
+                timeout=self.enqueue_timeout,
+            )
+            stopping = self._stopping.is_set()
+            if not stopping:
+                if not has_room:
+                    with self._stats_lock:
+                        self.rejected += len(rows)
+                    raise WriterOverloaded(f"Prediction write buffer full ({self.max_queue} rows)")
+                self._buffered_rows += len(rows)
+                self._queue.put((rows, future))
+        if stopping:
+            self._flush([(rows, future)])
+            return future
+        with self._stats_lock:
+            self.enqueued += len(rows)
+        return future
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            batch_rows = len(batch[0][0])
+            deadline = time.monotonic() + self.flush_interval
+            while batch_rows < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining <= 0 or self._stopping.is_set():
+                        call = self._queue.get_nowait()
+                    else:
+                        call = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(call)
+                batch_rows += len(call[0])
+            self._flush_and_release(batch, batch_rows)
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._flush_and_release(batch, sum(len(call_rows) for call_rows, _ in batch))
+
+    def _flush_and_release(self, batch, batch_rows: int):
+        try:
+            self._flush(batch)
+        finally:
+            with self._capacity:
+                self._buffered_rows -= batch_rows
+                self._capacity.notify_all()
+
+    def _flush(self, batch, retries: int = 1):
+        rows = [row for call_rows, _ in batch for row in call_rows]
+        started = time.perf_counter()
+        for attempt in range(retries + 1):
+            db = None
+            try:
+                db = self.session_factory()
+                record_predictions(db, rows)
+                db.commit()
+                error = None
+                break
+            except Exception as e:
+                if db is not None:
+                    db.rollback()
+                error = e
+                if attempt < retries:
+                    time.sleep(0.05 * (attempt + 1))
+            finally:
+                if db is not None:
+                    db.close()
+        elapsed = time.perf_counter() - started
+
+        with self._stats_lock:
+            self.flushes += 1
+            self.flush_seconds_total += elapsed
+            self.last_flush_ms = elapsed * 1000
+            self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+            if error is None:
+                self.flushed_rows += len(rows)
+            else:
+                self.failed_rows += len(rows)
+
+        if error is not None:
+            logger.error("❌ Failed to persist %d predictions: %s", len(rows), error)
+        for call_rows, future in batch:
+            if error is None:
+                future.set_result(len(call_rows))
+            else:
+                future.set_exception(error)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "enabled": self.enabled,
+                "queue_depth": self._buffered_rows,
+                "max_queue": self.max_queue,
+                "enqueued": self.enqueued,
+                "rejected": self.rejected,
+                "flushes": self.flushes,
+                "flushed_rows": self.flushed_rows,
+                "failed_rows": self.failed_rows,
+                "last_flush_ms": round(self.last_flush_ms, 3),
+                "mean_flush_ms": round(self.flush_seconds_total / self.flushes * 1000, 3) if self.flushes else 0.0,
+                "max_flush_ms": round(self.max_flush_ms, 3),
+            }
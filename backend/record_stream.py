@@ -0,0 +1,108 @@
+import csv
+import json
+
+from starlette.responses import StreamingResponse
+
+STREAM_FORMATS = ("ndjson", "csv")
+
+# A line longer than this can't be a PredictRequest; stop instead of buffering it
+MAX_LINE_BYTES = 64 * 1024
+
+
+class LineTooLong(Exception):
+    """Raised when the request body has a line longer than MAX_LINE_BYTES."""
+
+
+class LineSplitter:
+    """Splits a byte stream into complete lines, keeping only the unfinished tail."""
+
+    def __init__(self, max_line_bytes: int = MAX_LINE_BYTES):
+        self.max_line_bytes = max_line_bytes
+        self._tail = b""
+
+    def feed(self, data: bytes):
+        data = self._tail + data
+        lines = data.split(b"\n")
+        self._tail = lines.pop()
+        if len(self._tail) > self.max_line_bytes:
+            raise LineTooLong(f"line longer than {self.max_line_bytes} bytes")
+        return [line.rstrip(b"\r").decode("utf-8-sig") for line in lines]
+
+    def close(self):
+        tail, self._tail = self._tail, b""
+        return [tail.rstrip(b"\r").decode("utf-8-sig")] if tail.strip() else []
+
+
+class RecordParser:
+    """Turns body lines into ``(index, record or error message)`` pairs.
+
+    NDJSON: one JSON object per line. CSV: a header line, then one record per
+    line (quoted fields may not contain newlines). Blank lines are skipped
+    and don't take an index.
+    """
+
+    def __init__(self, format: str):
+        if format not in STREAM_FORMATS:
+            raise ValueError(f"format must be one of {', '.join(STREAM_FORMATS)}")
+        self.format = format
+        self.header = None
+        self.index = 0
+
+    def parse(self, lines):
+        parsed = []
+        for line in lines:
+            if not line.strip():
+                continue
+            if self.format == "csv" and self.header is None:
+                self.header = [name.strip() for name in next(csv.reader([line]))]
+                continue
+            parsed.append((self.index, self._parse_line(line)))
+            self.index += 1
+        return parsed
+
+    def _parse_line(self, line):
+        if self.format == "csv":
+            values = next(csv.reader([line]))
+            if len(values) != len(self.header):
+                return f"expected {len(self.header)} fields, got {len(values)}"
+            return dict(zip(self.header, values))
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            return f"invalid JSON: {e}"
+        if not isinstance(record, dict):
+            return f"expected an object, got {type(record).__name__}"
+        return record
+
+
+async def record_chunks(body, format: str, chunk_size: int):
+    """Yield lists of at most ``chunk_size`` parsed records from an async byte iterator.
+
+    Only the current chunk and one partial line are held in memory.
+    """
+    splitter, parser = LineSplitter(), RecordParser(format)
+    chunk = []
+    async for data in body:
+        chunk.extend(parser.parse(splitter.feed(data)))
+        while len(chunk) >= chunk_size:
+            yield chunk[:chunk_size]
+            chunk = chunk[chunk_size:]
+    chunk.extend(parser.parse(splitter.close()))
+    while chunk:
+        yield chunk[:chunk_size]
+        chunk = chunk[chunk_size:]
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """StreamingResponse whose body generator may still be reading the request.
+
+    Starlette's StreamingResponse listens for a client disconnect by calling
+    ``receive()`` alongside the body, which would swallow request body
+    messages. Here the generator reads the request itself (and sees the
+    disconnect there), so the listener is skipped.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,332 @@
+import datetime
+
+from sqlalchemy import case, func, literal_column, update
+
+from models import ReturnPrediction, ReturnRollup, ReturnHourlyRollup
+
+# Same cut-off /dashboard-data has always used for "high risk"
+HIGH_RISK_THRESHOLD = 0.7
+
+# rating_count only counts rows that have a rating, so average ratings ignore NULLs like AVG() does
+_SUM_COLUMNS = ("prediction_count", "high_risk_count", "rating_sum", "probability_sum", "rating_count")
+_EMPTY_SUMS = (0, 0, 0.0, 0.0, 0)
+
+# Inlined rather than bound: PostgreSQL only matches a GROUP BY expression to the select
+# list when they are textually identical, and two bound "" parameters are not
+_EMPTY = literal_column("''")
+
+
+def rollup_deltas(rows: list):
+    """Aggregate prediction row dicts into per (region, category) rollup increments."""
+    deltas = {}
+    for row in rows:
+        key = (row.get("customer_region") or "", row.get("product_category") or "")
+        _add_to_delta(deltas.setdefault(key, list(_EMPTY_SUMS)), row)
+    return deltas
+
+
+def _add_to_delta(delta: list, row: dict):
+    probability = row.get("return_probability") or 0.0
+    rating = row.get("product_rating")
+    if rating is not None and rating != rating:  # NaN from pandas-loaded files is stored as NULL
+        rating = None
+    delta[0] += 1
+    delta[1] += int(probability > HIGH_RISK_THRESHOLD)
+    delta[2] += rating or 0.0
+    delta[3] += probability
+    delta[4] += rating is not None
+
+
+def utcnow():
+    """Naive UTC timestamp, the form created_at and bucket_start are stored in."""
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def naive_utc(moment):
+    """Convert an aware timestamp to the naive UTC form used in the database (naive ones are assumed UTC)."""
+    if moment is not None and moment.tzinfo is not None:
+        moment = moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def hour_bucket(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def hourly_rollup_deltas(rows: list):
+    """Like rollup_deltas, keyed by (hour, region, category); rows without created_at are skipped."""
+    deltas = {}
+    for row in rows:
+        created_at = row.get("created_at")
+        if created_at is None:
+            continue
+        key = (hour_bucket(created_at), row.get("customer_region") or "", row.get("product_category") or "")
+        _add_to_delta(deltas.setdefault(key, list(_EMPTY_SUMS)), row)
+    return deltas
+
+
+def _apply_increments(db, model, key_columns, values: list):
+    """Add the _SUM_COLUMNS in ``values`` to ``model`` rows matched on ``key_columns``, inserting missing ones."""
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(model)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={col: getattr(model, col) + getattr(stmt.excluded, col) for col in _SUM_COLUMNS},
+        )
+        db.execute(stmt, values)
+        return
+
+    # Portable fallback: increment, and insert the cells that don't exist yet
+    for value in values:
+        result = db.execute(
+            update(model)
+            .where(*(getattr(model, col) == value[col] for col in key_columns))
+            .values({col: getattr(model, col) + value[col] for col in _SUM_COLUMNS})
+        )
+        if result.rowcount == 0:
+            db.add(model(**value))
+    db.flush()
+
+
+def apply_rollup_deltas(db, deltas: dict):
+    """Add ``deltas`` to the rollup table with in-database increments (caller commits)."""
+    if not deltas:
+        return
+    values = [
+        {"customer_region": region, "product_category": category, **dict(zip(_SUM_COLUMNS, delta))}
+        for (region, category), delta in deltas.items()
+    ]
+    _apply_increments(db, ReturnRollup, ("customer_region", "product_category"), values)
+
+
+def apply_hourly_deltas(db, deltas: dict):
+    """Add hourly_rollup_deltas output to the hourly rollup table (caller commits)."""
+    if not deltas:
+        return
+    values = [
+        {"bucket_start": bucket, "customer_region": region, "product_category": category,
+         **dict(zip(_SUM_COLUMNS, delta))}
+        for (bucket, region, category), delta in deltas.items()
+    ]
+    _apply_increments(db, ReturnHourlyRollup, ("bucket_start", "customer_region", "product_category"), values)
+
+
+def record_predictions(db, rows: list):
+    """Insert prediction rows and fold them into the rollups in the same transaction (caller commits).
+
+    Rows without ``created_at`` are stamped with the current time.
+    """
+    if not rows:
+        return
+    now = utcnow()
+    for row in rows:
+        if row.get("created_at") is None:
+            row["created_at"] = now
+    db.bulk_insert_mappings(ReturnPrediction, rows)
+    apply_rollup_deltas(db, rollup_deltas(rows))
+    apply_hourly_deltas(db, hourly_rollup_deltas(rows))
+
+
+def _aggregate_from_raw(db):
+    return db.query(
+        func.coalesce(ReturnPrediction.customer_region, _EMPTY),
+        func.coalesce(ReturnPrediction.product_category, _EMPTY),
+        func.count(ReturnPrediction.id),
+        func.sum(case((ReturnPrediction.return_probability > HIGH_RISK_THRESHOLD, 1), else_=0)),
+        func.coalesce(func.sum(ReturnPrediction.product_rating), 0.0),
+        func.coalesce(func.sum(ReturnPrediction.return_probability), 0.0),
+        func.count(ReturnPrediction.product_rating),
+    ).group_by(
+        func.coalesce(ReturnPrediction.customer_region, _EMPTY),
+        func.coalesce(ReturnPrediction.product_category, _EMPTY),
+    ).all()
+
+
+def rebuild_rollups(db):
+    """Recompute every rollup cell from return_predictions (caller commits)."""
+    db.query(ReturnRollup).delete(synchronize_session=False)
+    cells = [
+        {"customer_region": region, "product_category": category, **dict(zip(_SUM_COLUMNS, sums))}
+        for region, category, *sums in _aggregate_from_raw(db)
+    ]
+    if cells:
+        db.bulk_insert_mappings(ReturnRollup, cells)
+    return len(cells)
+
+
+def _hour_bucket_column(db):
+    """SQL expression truncating created_at to the hour, or None when the dialect has no helper here."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        return func.strftime("%Y-%m-%d %H:00:00", ReturnPrediction.created_at)
+    if dialect == "postgresql":
+        return func.date_trunc(literal_column("'hour'"), ReturnPrediction.created_at)
+    return None
+
+
+def rebuild_hourly_rollups(db):
+    """Recompute the hourly rollups from return_predictions rows that have created_at (caller commits)."""
+    db.query(ReturnHourlyRollup).delete(synchronize_session=False)
+    region = func.coalesce(ReturnPrediction.customer_region, _EMPTY)
+    category = func.coalesce(ReturnPrediction.product_category, _EMPTY)
+    bucket = _hour_bucket_column(db)
+
+    if bucket is None:
+        # Portable fallback: stream the raw rows and aggregate in Python
+        columns = (ReturnPrediction.created_at, ReturnPrediction.customer_region, ReturnPrediction.product_category,
+                   ReturnPrediction.product_rating, ReturnPrediction.return_probability)
+        rows = db.query(*columns).filter(ReturnPrediction.created_at.isnot(None)).yield_per(50_000)
+        apply_hourly_deltas(db, hourly_rollup_deltas(row._asdict() for row in rows))
+        return db.query(func.count(ReturnHourlyRollup.id)).scalar()
+
+    aggregates = db.query(
+        bucket, region, category,
+        func.count(ReturnPrediction.id),
+        func.sum(case((ReturnPrediction.return_probability > HIGH_RISK_THRESHOLD, 1), else_=0)),
+        func.coalesce(func.sum(ReturnPrediction.product_rating), 0.0),
+        func.coalesce(func.sum(ReturnPrediction.return_probability), 0.0),
+        func.count(ReturnPrediction.product_rating),
+    ).filter(ReturnPrediction.created_at.isnot(None)).group_by(bucket, region, category).all()
+
+    cells = [
+        {
+            "bucket_start": datetime.datetime.fromisoformat(start) if isinstance(start, str) else start,
+            "customer_region": region_value, "product_category": category_value,
+            **dict(zip(_SUM_COLUMNS, sums)),
+        }
+        for start, region_value, category_value, *sums in aggregates
+    ]
+    if cells:
+        db.bulk_insert_mappings(ReturnHourlyRollup, cells)
+    return len(cells)
+
+
+def check_rollups(db, tolerance: float = 1e-6):
+    """Compare the rollup table with a fresh aggregate of the raw table."""
+    expected = {(region, category): sums for region, category, *sums in _aggregate_from_raw(db)}
+    stored = {
+        (r.customer_region, r.product_category): [getattr(r, col) for col in _SUM_COLUMNS]
+        for r in db.query(ReturnRollup).all()
+    }
+
+    mismatches = []
+    for key in sorted(set(expected) | set(stored)):
+        want = expected.get(key, _EMPTY_SUMS)
+        have = stored.get(key, _EMPTY_SUMS)
+        diffs = {
+            col: {"raw": w, "rollup": h}
+            for col, w, h in zip(_SUM_COLUMNS, want, have)
+            if abs((w or 0) - (h or 0)) > tolerance * max(1.0, abs(w or 0))
+        }
+        if diffs:
+            mismatches.append({"customer_region": key[0], "product_category": key[1], "differences": diffs})
+    return {"consistent": not mismatches, "cells_checked": len(set(expected) | set(stored)), "mismatches": mismatches}
+
+
+def dashboard_summary(db, region=None, since=None):
+    """Totals and per-category averages for /dashboard-data, read from the rollups only.
+
+    With ``since`` only predictions from that hour onwards are counted (hourly
+    rollups, so the window starts on the hour).
+    """
+    model = ReturnRollup if since is None else ReturnHourlyRollup
+    query = db.query(model.product_category, *(func.sum(getattr(model, col)) for col in _SUM_COLUMNS))
+    if since is not None:
+        query = query.filter(ReturnHourlyRollup.bucket_start >= hour_bucket(since))
+    if region:
+        query = query.filter(model.customer_region == region)
+    by_category = {category: sums for category, *sums in query.group_by(model.product_category)}
+
+    categories = sorted(cat for cat, totals in by_category.items() if totals[0])
+    return {
+        "total_returns": sum(by_category[cat][0] for cat in categories),
+        "high_risk_returns": sum(by_category[cat][1] for cat in categories),
+        "return_by_category": {cat: by_category[cat][0] for cat in categories},
+        "average_rating_by_category": {
+            cat: round(by_category[cat][2] / by_category[cat][4], 2) if by_category[cat][4] else None
+            for cat in categories
+        },
+        "average_return_probability_by_category": {
+            cat: round(by_category[cat][3] / by_category[cat][0], 2) for cat in categories
+        },
+    }
+
+
+TIMESERIES_BUCKETS = {"hour": datetime.timedelta(hours=1), "day": datetime.timedelta(days=1)}
+
+
+def _bucket_start(moment, bucket):
+    start = hour_bucket(moment)
+    return start.replace(hour=0) if bucket == "day" else start
+
+
+def _day_column(db):
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        return func.date(ReturnHourlyRollup.bucket_start)
+    if dialect == "postgresql":
+        return func.date_trunc(literal_column("'day'"), ReturnHourlyRollup.bucket_start)
+    return None
+
+
+def _as_datetime(value):
+    if isinstance(value, str):
+        return datetime.datetime.fromisoformat(value)
+    if not isinstance(value, datetime.datetime):
+        return datetime.datetime.combine(value, datetime.time())
+    return value
+
+
+def prediction_timeseries(db, start, end, bucket="hour", region=None, category=None):
+    """Per-category prediction counts and mean probability per hour or day in [start, end), from the hourly rollups.
+
+    Every bucket in the range is present; empty ones have zero counts and null means.
+    """
+    step = TIMESERIES_BUCKETS[bucket]
+    first = _bucket_start(start, bucket)
+    # Sum the hourly cells per (bucket, category) in the database; a 90-day daily series reads
+    # ~20k cells but returns ~100 rows per category
+    bucket_column = ReturnHourlyRollup.bucket_start if bucket == "hour" else _day_column(db)
+    group_column = ReturnHourlyRollup.bucket_start if bucket_column is None else bucket_column
+    query = db.query(
+        group_column, ReturnHourlyRollup.product_category,
+        *(func.sum(getattr(ReturnHourlyRollup, col)) for col in _SUM_COLUMNS),
+    ).filter(ReturnHourlyRollup.bucket_start >= first, ReturnHourlyRollup.bucket_start < end)
+    if region:
+        query = query.filter(ReturnHourlyRollup.customer_region == region)
+    if category:
+        query = query.filter(ReturnHourlyRollup.product_category == category)
+
+    totals = {}
+    for bucket_start, cell_category, *sums in query.group_by(group_column, ReturnHourlyRollup.product_category):
+        # Without a day expression for this dialect, hourly sums are folded into days here
+        cell = totals.setdefault(cell_category, {}).setdefault(
+            _bucket_start(_as_datetime(bucket_start), bucket), list(_EMPTY_SUMS))
+        for i, value in enumerate(sums):
+            cell[i] += value
+
+    buckets = []
+    moment = first
+    while moment < end:
+        buckets.append(moment)
+        moment += step
+
+    series = {}
+    for cell_category in sorted(totals):
+        points = []
+        for moment in buckets:
+            count, high_risk, rating_sum, probability_sum, rating_count = totals[cell_category].get(moment, _EMPTY_SUMS)
+            points.append({
+                "time": moment.isoformat(),
+                "predictions": count,
+                "high_risk": high_risk,
+                "mean_return_probability": round(probability_sum / count, 3) if count else None,
+                "mean_rating": round(rating_sum / rating_count, 2) if rating_count else None,
+            })
+        series[cell_category] = points
+    return {"bucket": bucket, "start": first.isoformat(), "end": end.isoformat(), "timezone": "UTC", "series": series}
@@ -0,0 +1,248 @@
+"""Bulk-score an order file offline with the same encoding and model as the API.
+
+Run from backend/:
+    python score_file.py orders.csv scored.csv --workers 4 --explain
+    python score_file.py orders.parquet scored.parquet --chunksize 100000 --load-db
+
+The input (CSV or Parquet, columns as in smart_returns_dataset.csv) is read in
+chunks; each chunk is scored in a worker process that holds its own copy of
+the model, and results are appended to the output in input order. At most
+``2 * workers`` chunks are in flight, so memory stays flat whatever the file
+size. Parquet needs pyarrow.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from feature_encoder import CATEGORICAL_FIELDS
+from model_registry import REQUEST_NUMERIC_FIELDS
+
+REQUIRED_COLUMNS = list(CATEGORICAL_FIELDS) + list(REQUEST_NUMERIC_FIELDS)
+REASON_COLUMNS = ["reason_1", "reason_2", "reason_3"]
+
+# Output column -> return_predictions column, for --load-db
+DB_COLUMNS = {
+    "Product_Category": "product_category",
+    "Product_Size": "product_size",
+    "Customer_Region": "customer_region",
+    "Customer_Age_Group": "customer_age_group",
+    "Past_Return_Count": "past_return_count",
+    "Product_Rating": "product_rating",
+    "Delivery_Time_Days": "delivery_time_days",
+    "prediction": "prediction",
+    "return_probability": "return_probability",
+    "model_version": "model_version",
+}
+
+
+def _is_parquet(path):
+    return path.lower().endswith((".parquet", ".pq"))
+
+
+def read_chunks(path, chunksize):
+    """Yield DataFrames of at most ``chunksize`` rows without loading the whole file."""
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        # Categoricals stay strings; missing ones ("NA" sizes) are NaN, which the encoder maps to Unknown
+        yield from pd.read_csv(path, chunksize=chunksize, dtype={field: str for field in CATEGORICAL_FIELDS})
+
+
+def arrow_schema(frame):
+    """Parquet schema for scored chunks like ``frame``.
+
+    Input and score columns get fixed types, so a first chunk where one of
+    them is all missing doesn't pin it to ``null``; other columns keep the
+    type inferred from ``frame`` (string if that is ``null``).
+    """
+    import pyarrow as pa
+
+    types = {field: pa.string() for field in CATEGORICAL_FIELDS}
+    types.update({"Past_Return_Count": pa.int64(), "Product_Rating": pa.float64(), "Delivery_Time_Days": pa.int64(),
+                  "return_probability": pa.float64(), "prediction": pa.string(), "model_version": pa.string()})
+    types.update({column: pa.string() for column in REASON_COLUMNS})
+    inferred = pa.Schema.from_pandas(frame, preserve_index=False)
+    return pa.schema([
+        (field.name, types.get(field.name, pa.string() if pa.types.is_null(field.type) else field.type))
+        for field in inferred
+    ])
+
+
+class ChunkWriter:
+    """Appends scored chunks to a CSV or Parquet file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._parquet = None
+        self._started = False
+
+    def write(self, frame):
+        if _is_parquet(self.path):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, arrow_schema(frame))
+            self._parquet.write_table(pa.Table.from_pandas(frame, schema=self._parquet.schema, preserve_index=False))
+        else:
+            frame.to_csv(self.path, mode="a" if self._started else "w", header=not self._started, index=False)
+        self._started = True
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def _init_worker():
+    # Load the model once per process; MODEL_DIR/INFERENCE_BACKEND come from the parent's environment.
+    # Spawned processes start with no handlers, so predict_logic's logs need setup_logging() first
+    from logger_config import setup_logging
+    setup_logging()
+    import predict_logic
+    predict_logic.load_model()
+
+
+def score_chunk(frame, explain=False):
+    """Score one chunk; returns it with return_probability, prediction, model_version (and reasons)."""
+    import predict_logic
+
+    probs, reasons, version = predict_logic.score_columns(frame, len(frame), explain)
+    scored = frame.copy()
+    # Same rounding and cut-off as format_prediction
+    scored["return_probability"] = np.round(probs, 3)
+    scored["prediction"] = np.where(probs > 0.5, "Yes", "No")
+    scored["model_version"] = version
+    if explain:
+        for i, column in enumerate(REASON_COLUMNS):
+            scored[column] = [top[i] if i < len(top) else None for top in reasons]
+    return scored
+
+
+def database_rows(scored):
+    """return_predictions row dicts for a scored chunk (missing values become NULL)."""
+    rows = scored[list(DB_COLUMNS)].rename(columns=DB_COLUMNS)
+    rows = rows.astype(object).where(rows.notna(), None)
+    return rows.to_dict("records")
+
+
+class DatabaseLoader:
+    """Bulk-inserts scored chunks into return_predictions, one transaction per chunk."""
+
+    def __init__(self):
+        from database import SessionLocal, engine
+        from migrations import upgrade_schema
+        from models import Base
+
+        upgrade_schema(engine, Base.metadata)
+        self.session_factory = SessionLocal
+        self.rows = 0
+
+    def load(self, scored):
+        from rollups import record_predictions
+
+        rows = database_rows(scored)
+        db = self.session_factory()
+        try:
+            record_predictions(db, rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self.rows += len(rows)
+
+
+def _check_columns(frame):
+    missing = [column for column in REQUIRED_COLUMNS if column not in frame.columns]
+    if missing:
+        raise SystemExit(f"Input is missing required columns: {', '.join(missing)}")
+
+
+def score_file(input_path, output_path, chunksize=50000, workers=1, explain=False, load_db=False, progress=True):
+    """Score ``input_path`` into ``output_path``; returns a summary dict with rows/sec."""
+    writer = ChunkWriter(output_path)
+    loader = DatabaseLoader() if load_db else None
+    executor = None
+    if workers > 0:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_init_worker)
+
+    started = time.perf_counter()
+    rows = chunks = 0
+
+    def drain(result):
+        nonlocal rows, chunks
+        writer.write(result)
+        if loader is not None:
+            loader.load(result)
+        rows += len(result)
+        chunks += 1
+        if progress:
+            elapsed = time.perf_counter() - started
+            print(f"  {rows} rows scored ({rows / elapsed:.0f} rows/s)", file=sys.stderr)
+
+    try:
+        pending = deque()
+        for frame in read_chunks(input_path, chunksize):
+            if chunks == 0 and not pending:
+                _check_columns(frame)
+            if executor is None:
+                drain(score_chunk(frame, explain))
+                continue
+            pending.append(executor.submit(score_chunk, frame, explain))
+            # Bounded in-flight work: results are written in input order as they complete
+            while len(pending) >= 2 * workers:
+                drain(pending.popleft().result())
+        while pending:
+            drain(pending.popleft().result())
+    finally:
+        writer.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "chunks": chunks,
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else None,
+        "db_rows": loader.rows if loader else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="orders to score (.csv or .parquet)")
+    parser.add_argument("output", help="scored file (.csv or .parquet)")
+    parser.add_argument("--chunksize", type=int, default=50000, help="rows per chunk")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="scoring processes (0 scores in this process)")
+    parser.add_argument("--explain", action="store_true", help="add the top-3 SHAP reasons (much slower)")
+    parser.add_argument("--load-db", action="store_true", help="also insert the results into return_predictions")
+    parser.add_argument("--model-dir", help="model artifacts to use (default: MODEL_DIR or backend/model)")
+    args = parser.parse_args()
+
+    if args.model_dir:
+        # Set before predict_logic is imported here or in the spawned workers
+        os.environ["MODEL_DIR"] = os.path.abspath(args.model_dir)
+
+    print(f"🚀 Scoring {args.input} with {args.workers} worker(s), {args.chunksize} rows per chunk", file=sys.stderr)
+    summary = score_file(args.input, args.output, args.chunksize, args.workers, args.explain, args.load_db)
+    print(f"✅ {summary['rows']} rows in {summary['seconds']}s ({summary['rows_per_sec']} rows/s) -> {args.output}",
+          file=sys.stderr)
+    if args.load_db:
+        print(f"🗄️ {summary['db_rows']} rows loaded into return_predictions", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRODUCTS_FILE = os.getenv("PRODUCTS_FILE", os.path.join(BASE_DIR, "data", "products.json"))
+
+
+def _normalize(name):
+    return str(name).strip().casefold() if name is not None else ""
+
+
+class _Snapshot:
+    """Immutable, fully indexed view of one version of the product file."""
+
+    def __init__(self, products: list, digest: str):
+        self.digest = digest
+        self.products = products
+        self.by_name = {}
+        self.by_category = {}
+        for product in products:
+            name = product.get("name")
+            if name is None:
+                continue
+            self.by_name[_normalize(name)] = product
+            category = product.get("category", name)
+            self.by_category.setdefault(_normalize(category), []).append(product)
+        # Per-category answers are precomputed so lookups stay O(1) on large catalogs
+        self.category_alternatives = {
+            key: [alt for p in products_in for alt in p.get("alternatives", [])]
+            for key, products_in in self.by_category.items()
+        }
+        self.category_discount = {}
+        for key, products_in in self.by_category.items():
+            best = max(products_in, key=lambda p: p.get("discount_percent", 0))
+            self.category_discount[key] = {
+                "discount_percent": best.get("discount_percent", 0), "reason": best.get("discount_reason", "N/A")
+            }
+        self.discount_summary = {
+            p["name"]: {"discount_percent": p.get("discount_percent", 0), "reason": p.get("discount_reason", "N/A")}
+            for p in products if "name" in p
+        }
+
+
+class ProductCatalog:
+    """In-memory index over ``data/products.json``.
+
+    The file is parsed once and re-read only when its mtime/size change and
+    its content hash differs, checked at most every ``check_interval``
+    seconds. Each load builds a new snapshot that is swapped in whole, so
+    readers never see a half-built index. If a reload fails, the last good
+    snapshot stays in use. Category lookups ignore case and a trailing "s",
+    so "Laptop" and "Laptops" resolve to the same entry.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._snapshot = _Snapshot([], "")
+        self._signature = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def _current(self):
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self._refresh()
+        return self._snapshot
+
+    def _refresh(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            try:
+                st = os.stat(self.path)
+                signature = (st.st_mtime_ns, st.st_size)
+                if signature == self._signature:
+                    return
+                with open(self.path, "rb") as f:
+                    raw = f.read()
+                digest = hashlib.sha256(raw).hexdigest()
+                if digest != self._snapshot.digest:
+                    self._snapshot = _Snapshot(json.loads(raw), digest)
+                    self.reloads += 1
+                    logger.info("📦 Product catalog loaded: %d products", len(self._snapshot.by_name))
+                self._signature = signature
+            except Exception as e:
+                logger.warning("⚠️ Couldn't read product file: %s", e)
+
+    def get(self, name):
+        return self._current().by_name.get(_normalize(name))
+
+    @staticmethod
+    def _lookup(index, category):
+        key = _normalize(category)
+        if key in index:
+            return index[key]
+        return index.get(key[:-1] if key.endswith("s") else key + "s")
+
+    def by_category(self, category):
+        return list(self._lookup(self._current().by_category, category) or [])
+
+    def alternatives_for(self, category):
+        return list(self._lookup(self._current().category_alternatives, category) or [])
+
+    def discount_for(self, category):
+        """Best catalog discount for ``category``, or None if the category is unknown."""
+        discount = self._lookup(self._current().category_discount, category)
+        return dict(discount) if discount is not None else None
+
+    def discount_summary(self):
+        return self._current().discount_summary
+
+    def stats(self):
+        snapshot = self._current()
+        return {"path": self.path, "products": len(snapshot.by_name), "categories": len(snapshot.by_category),
+                "reloads": self.reloads, "digest": snapshot.digest[:12]}
+
+
+catalog = ProductCatalog(PRODUCTS_FILE)
@@ -1,10 +1,17 @@
-def calculate_discount(return_probability: float):
+from services.catalog import catalog
+
+def calculate_discount(return_probability: float, category: str = None):
     try:
         if return_probability > 90:
-            return {"discount_percent": 20, "reason": "Very high return risk"}
+            result = {"discount_percent": 20, "reason": "Very high return risk"}
         elif return_probability > 70:
-            return {"discount_percent": 10, "reason": "High return risk"}
+            result = {"discount_percent": 10, "reason": "High return risk"}
         else:
-            return {"discount_percent": 0, "reason": "No risk mitigation needed"}
+            result = {"discount_percent": 0, "reason": "No risk mitigation needed"}
+
+        # Standing discount configured for the category in the product catalog
+        if category is not None:
+            result["category_discount"] = catalog.discount_for(category)
+        return result
     except Exception as e:
         return {"discount_percent": 0, "reason": f"❌ Discount logic failed: {str(e)}"}
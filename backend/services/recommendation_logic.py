@@ -1,14 +1,17 @@
-safe_alternatives = {
-    "Shoes": "Shoes with adjustable sizes and flexible returns",
-    "Laptop": "Laptop with extended warranty and fewer complaints",
-    "Shirts": "Stretchable or free-size Shirts with positive reviews"
-}
+from services.catalog import catalog
 
 def recommend_alternative(category: str):
     try:
-        recommendation = safe_alternatives.get(category, "No better alternative found for this category.")
+        alternatives = catalog.alternatives_for(category)
+        if not alternatives:
+            return {
+                "recommended_product": "No better alternative found for this category.",
+                "alternatives": [],
+                "reason": "Recommended based on lower historical return rates in this category."
+            }
         return {
-            "recommended_product": recommendation,
+            "recommended_product": alternatives[0],
+            "alternatives": alternatives,
             "reason": "Recommended based on lower historical return rates in this category."
         }
     except Exception as e:
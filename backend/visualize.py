@@ -1,75 +1,147 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from database import SessionLocal
-from models import ReturnPrediction, Stock
-import matplotlib.pyplot as plt
+from models import ReturnPrediction, ReturnRollup
+from html import escape
+import threading
 import io
 import base64
+from metrics import stage_timer
 
-def stock_bar_chart():
-    try:
-        db: Session = SessionLocal()
+CHART_FORMATS = ("png", "svg", "json")
 
-        # 1. Return count by product category
-        return_counts = db.query(
-            ReturnPrediction.product_category,
-            func.count(ReturnPrediction.id)
-        ).group_by(ReturnPrediction.product_category).all()
+# Rendered charts keyed by (format, data version); only the latest version is kept
+_chart_cache = {}
+_cache_lock = threading.Lock()
+_render_lock = threading.Lock()
 
-        # 2. Average return probability by category
-        avg_probs = db.query(
-            ReturnPrediction.product_category,
-            func.avg(ReturnPrediction.return_probability)
-        ).group_by(ReturnPrediction.product_category).all()
+def data_version(db: Session):
+    """Cheap fingerprint of return_predictions: max id plus the rolled-up row count."""
+    max_id = db.query(func.max(ReturnPrediction.id)).scalar() or 0
+    total = db.query(func.sum(ReturnRollup.prediction_count)).scalar() or 0
+    return f"{max_id}:{total}"
 
-        db.close()
+def chart_data(db: Session):
+    """Return counts and average return probability (%) per category, read from the rollups."""
+    rows = db.query(
+        ReturnRollup.product_category,
+        func.sum(ReturnRollup.prediction_count),
+        func.sum(ReturnRollup.probability_sum)
+    ).group_by(ReturnRollup.product_category).order_by(ReturnRollup.product_category).all()
+
+    rows = [(cat, int(count), prob_sum) for cat, count, prob_sum in rows if count]
+    if not rows:
+        return {"categories": ["No data"], "counts": [0], "avg_return_probability": [0]}
+    return {
+        "categories": [cat for cat, _, _ in rows],
+        "counts": [count for _, count, _ in rows],
+        "avg_return_probability": [round(prob_sum / count * 100, 2) for _, count, prob_sum in rows]  # Convert to %
+    }
+
+def render_png_html(data: dict):
+    # Imported here so matplotlib is only loaded by processes that rasterize charts
+    from matplotlib.figure import Figure
+
+    categories = data["categories"]
+    counts = data["counts"]
+    avg_returns = data["avg_return_probability"]
+
+    # Plotting (object API, no pyplot global state, so concurrent renders are safe)
+    fig = Figure(figsize=(7, 6))
+    axs = fig.subplots(2, 1)
+    fig.tight_layout(pad=4)
+
+    # Chart 1 - Return count
+    bars1 = axs[0].bar(categories, counts, color='mediumpurple')
+    axs[0].set_title("📦 Return Count by Product Category", fontsize=11)
+    axs[0].set_ylabel("Count")
+    for bar in bars1:
+        height = bar.get_height()
+        axs[0].annotate(f'{height}', xy=(bar.get_x() + bar.get_width()/2, height),
+                        xytext=(0, 3), textcoords="offset points",
+                        ha='center', va='bottom', fontsize=8)
+
+    # Chart 2 - Avg return probability
+    bars2 = axs[1].bar(categories, avg_returns, color='tomato')
+    axs[1].set_title("📈 Avg Return Probability by Category", fontsize=11)
+    axs[1].set_ylabel("Probability (%)")
+    axs[1].set_ylim(0, 100)
+    for bar in bars2:
+        height = bar.get_height()
+        axs[1].annotate(f'{height:.1f}%', xy=(bar.get_x() + bar.get_width()/2, height),
+                        xytext=(0, 3), textcoords="offset points",
+                        ha='center', va='bottom', fontsize=8)
+
+    # Save as base64
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight")
+    image_base64 = base64.b64encode(buf.getvalue()).decode("utf-8")
+    buf.close()
 
-        if not return_counts:
-            return_counts = [("No data", 0)]
-        if not avg_probs:
-            avg_probs = [("No data", 0)]
-
-        categories1 = [r[0] for r in return_counts]
-        counts = [r[1] for r in return_counts]
-
-        categories2 = [r[0] for r in avg_probs]
-        avg_returns = [round(r[1] * 100, 2) for r in avg_probs]  # Convert to %
-
-        # Plotting
-        fig, axs = plt.subplots(2, 1, figsize=(7, 6))
-        fig.tight_layout(pad=4)
-
-        # Chart 1 - Return count
-        bars1 = axs[0].bar(categories1, counts, color='mediumpurple')
-        axs[0].set_title("📦 Return Count by Product Category", fontsize=11)
-        axs[0].set_ylabel("Count")
-        for bar in bars1:
-            height = bar.get_height()
-            axs[0].annotate(f'{height}', xy=(bar.get_x() + bar.get_width()/2, height),
-                            xytext=(0, 3), textcoords="offset points",
-                            ha='center', va='bottom', fontsize=8)
-
-        # Chart 2 - Avg return probability
-        bars2 = axs[1].bar(categories2, avg_returns, color='tomato')
-        axs[1].set_title("📈 Avg Return Probability by Category", fontsize=11)
-        axs[1].set_ylabel("Probability (%)")
-        axs[1].set_ylim(0, 100)
-        for bar in bars2:
-            height = bar.get_height()
-            axs[1].annotate(f'{height:.1f}%', xy=(bar.get_x() + bar.get_width()/2, height),
-                            xytext=(0, 3), textcoords="offset points",
-                            ha='center', va='bottom', fontsize=8)
-
-        # Save as base64
-        buf = io.BytesIO()
-        plt.savefig(buf, format="png", bbox_inches="tight")
-        buf.seek(0)
-        image_base64 = base64.b64encode(buf.getvalue()).decode("utf-8")
-        buf.close()
-        plt.close(fig)
-
-        # Return as embeddable HTML
-        return f'<h3>📊 Dashboard Charts</h3><img src="data:image/png;base64,{image_base64}" alt="Chart" style="width:100%; max-width:600px;">'
+    # Return as embeddable HTML
+    return f'<h3>📊 Dashboard Charts</h3><img src="data:image/png;base64,{image_base64}" alt="Chart" style="width:100%; max-width:600px;">'
 
+def _svg_bars(title, categories, values, color, y_offset, max_value, label_fmt):
+    width, height, left, bar_area = 600, 220, 50, 150
+    slot = (width - left - 20) / max(len(categories), 1)
+    parts = [f'<text x="{width / 2}" y="{y_offset + 20}" text-anchor="middle" font-size="14">{escape(title)}</text>']
+    for i, (cat, value) in enumerate(zip(categories, values)):
+        bar_h = (value / max_value * bar_area) if max_value else 0
+        x = left + i * slot + slot * 0.15
+        y = y_offset + 30 + bar_area - bar_h
+        parts.append(f'<rect x="{x:.1f}" y="{y:.1f}" width="{slot * 0.7:.1f}" height="{bar_h:.1f}" fill="{color}"/>')
+        parts.append(f'<text x="{x + slot * 0.35:.1f}" y="{y - 3:.1f}" text-anchor="middle" font-size="10">{label_fmt(value)}</text>')
+        parts.append(f'<text x="{x + slot * 0.35:.1f}" y="{y_offset + 30 + bar_area + 14}" text-anchor="middle" font-size="11">{escape(str(cat))}</text>')
+    return parts, height
+
+def render_svg(data: dict):
+    """Render both charts as a self-contained SVG document, without matplotlib."""
+    counts_svg, h1 = _svg_bars("Return Count by Product Category", data["categories"], data["counts"],
+                               "mediumpurple", 0, max(data["counts"] + [1]), lambda v: f"{v}")
+    probs_svg, h2 = _svg_bars("Avg Return Probability by Category", data["categories"], data["avg_return_probability"],
+                              "tomato", h1, 100, lambda v: f"{v:.1f}%")
+    body = "".join(counts_svg + probs_svg)
+    return f'<svg xmlns="http://www.w3.org/2000/svg" width="600" height="{h1 + h2}" font-family="sans-serif">{body}</svg>'
+
+def render_chart(fmt: str = "png"):
+    """Return the chart in ``fmt`` ("png" HTML, "svg" or "json"), reusing the cached render while the data is unchanged."""
+    if fmt not in CHART_FORMATS:
+        raise ValueError(f"Unsupported chart format: {fmt}")
+
+    db: Session = SessionLocal()
+    try:
+        with stage_timer("chart_version"):
+            version = data_version(db)
+        key = (fmt, version)
+        with _cache_lock:
+            if key in _chart_cache:
+                return _chart_cache[key]
+
+        # One render at a time; concurrent callers for the same version reuse its result
+        with _render_lock:
+            with _cache_lock:
+                if key in _chart_cache:
+                    return _chart_cache[key]
+            with stage_timer("chart_query"):
+                data = chart_data(db)
+            with stage_timer(f"chart_render_{fmt}"):
+                if fmt == "json":
+                    chart = {"data_version": version, **data}
+                elif fmt == "svg":
+                    chart = render_svg(data)
+                else:
+                    chart = render_png_html(data)
+
+        with _cache_lock:
+            for stale in [k for k in _chart_cache if k[1] != version]:
+                del _chart_cache[stale]
+            _chart_cache[key] = chart
+        return chart
+    finally:
+        db.close()
+
+def stock_bar_chart():
+    try:
+        return render_chart("png")
     except Exception as e:
         return f"<p>Plotting Error: {str(e)}</p>"
@@ -63,8 +63,8 @@ if submitted:
 
     with st.spinner("Processing prediction..."):
         try:
-            pred_res = requests.post("http://127.0.0.1:8000/predict-return", json=input_data).json()
-            explain_res = requests.post("http://127.0.0.1:8000/explain-return", json=input_data).json()
+            # One call returns prediction, explanation, discount and recommendation
+            pred_res = requests.post("http://127.0.0.1:8000/assess-return", json=input_data).json()
 
             prob = round(pred_res["return_probability"] * 100, 1)
             risk_level = "High" if prob > 70 else "Medium" if prob > 40 else "Low"
@@ -74,7 +74,7 @@ if submitted:
             st.markdown(f"**Return Probability:** {prob}%")
             st.markdown(f"**Risk Level:** :{risk_color}[{risk_level}]")
             st.markdown("#### 🧠 Key Factors")
-            st.write(explain_res["top_reasons"])
+            st.write(pred_res["top_reasons"])
 
         except Exception as e:
             st.error(f"❌ Prediction failed: {e}")
@@ -83,17 +83,8 @@ if submitted:
 if submitted:
     with st.expander("🎁 Offers & Recommendations", expanded=True):
         try:
-            return_probability = pred_res["return_probability"] * 100
-
-            discount = requests.post(
-                "http://127.0.0.1:8000/get-discount", 
-                json={"return_probability": return_probability}
-            ).json()
-
-            recommend = requests.post(
-                "http://127.0.0.1:8000/recommend", 
-                json={"Product_Category": product_category}
-            ).json()
+            discount = pred_res["discount"]
+            recommend = pred_res["recommendation"]
 
             st.markdown(f"**💸 Discount Suggestion:** {discount['discount_percent']}% — _{discount['reason']}_")
             st.markdown("**🔄 Recommended Alternatives:**")
@@ -109,13 +100,17 @@ st.header("📊 Real-Time Dashboard Summary")
 
 # 🔽 Region Filter Dropdown
 selected_region = st.selectbox("🌍 Select Region to Filter", ["All", "North", "South", "East", "West"])
+selected_period = st.selectbox("🕒 Period", ["All time", "Last 24 hours", "Last 7 days"])
+period_hours = {"All time": None, "Last 24 hours": 24, "Last 7 days": 168}[selected_period]
 
 try:
-    # Pass region to backend if not "All"
-    if selected_region == "All":
-        dashboard = requests.get("http://127.0.0.1:8000/dashboard-data").json()
-    else:
-        dashboard = requests.get(f"http://127.0.0.1:8000/dashboard-data?region={selected_region}").json()
+    # Pass region and time window to backend when set
+    params = {}
+    if selected_region != "All":
+        params["region"] = selected_region
+    if period_hours:
+        params["hours"] = period_hours
+    dashboard = requests.get("http://127.0.0.1:8000/dashboard-data", params=params).json()
 
     col1, col2 = st.columns(2)
     col1.metric("📦 Total Returns", dashboard["total_returns"])
@@ -143,6 +138,26 @@ try:
         use_container_width=True
     )
 
+    # 📈 Hourly mean return probability per category (last 7 days for "All time")
+    st.subheader("📈 Return Probability Over Time")
+    ts_params = {"bucket": "hour", "hours": period_hours or 168}
+    if selected_region != "All":
+        ts_params["region"] = selected_region
+    series = requests.get("http://127.0.0.1:8000/dashboard-data/timeseries", params=ts_params).json()["series"]
+    df_ts = pd.DataFrame([
+        {"Time": point["time"], "Category": category, "Mean Probability": point["mean_return_probability"]}
+        for category, points in series.items() for point in points if point["predictions"]
+    ])
+    if df_ts.empty:
+        st.info("No timestamped predictions in this period yet.")
+    else:
+        st.altair_chart(
+            alt.Chart(df_ts).mark_line(point=True).encode(
+                x="Time:T", y="Mean Probability:Q", color="Category"
+            ).properties(height=300),
+            use_container_width=True
+        )
+
     # 📦 Stock Summary Pie Chart
     st.subheader("📦 Stock Summary")
     stock_dict = dashboard["stock_summary"]
@@ -167,7 +182,14 @@ st.markdown("---")
 st.header("📘 Logs")
 
 try:
-    response = requests.get("http://localhost:8000/view-logs")
+    log_col1, log_col2 = st.columns(2)
+    log_lines = log_col1.number_input("Lines", min_value=50, max_value=5000, value=300, step=50)
+    log_level = log_col2.selectbox("Level", ["All", "INFO", "WARNING", "ERROR"])
+    log_params = {"lines": log_lines}
+    if log_level != "All":
+        log_params["level"] = log_level
+    # Only the tail is fetched; the backend seeks from the end instead of reading the whole log
+    response = requests.get("http://localhost:8000/view-logs", params=log_params)
     if response.status_code == 200:
         logs = response.json().get("logs", "")
         if logs:
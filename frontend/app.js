@@ -50,24 +50,16 @@ form.addEventListener("submit", async (e) => {
   };
 
   try {
-    const [predictRes, explainRes] = await Promise.all([
-      fetch("http://127.0.0.1:8000/predict-return", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(data),
-      }),
-      fetch("http://127.0.0.1:8000/explain-return", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(data),
-      }),
-    ]);
-
-    if (!predictRes.ok || !explainRes.ok)
-      throw new Error(`API Error: ${predictRes.status} | ${explainRes.status}`);
-
-    const predictJson = await predictRes.json();
-    const explainJson = await explainRes.json();
+    // Prediction, explanation, discount and recommendation in one round trip
+    const assessRes = await fetch("http://127.0.0.1:8000/assess-return", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(data),
+    });
+
+    if (!assessRes.ok) throw new Error(`API Error: ${assessRes.status}`);
+
+    const predictJson = await assessRes.json();
 
     const probabilityPercent = (predictJson.return_probability * 100).toFixed(1);
     const riskLevel =
@@ -94,7 +86,7 @@ form.addEventListener("submit", async (e) => {
         </div>
         <h4>🧠 Key Factors Influencing This Prediction:</h4>
         <ul class="reasons-list">
-          ${explainJson.top_reasons.map((r) => `<li>${r}</li>`).join("")}
+          ${predictJson.top_reasons.map((r) => `<li>${r}</li>`).join("")}
         </ul>
         <div class="recommendation">
           <h4>💡 Recommendation:</h4>
@@ -103,7 +95,7 @@ form.addEventListener("submit", async (e) => {
       </div>
     `;
 
-    await loadAdditionalInfo(data);
+    await loadAdditionalInfo(predictJson);
     await loadVisualization();
   } catch (err) {
     resultDiv.innerHTML = `
@@ -126,43 +118,28 @@ function getRecommendation(prob, level) {
 // 📊 Load Chart Visualization
 async function loadVisualization() {
   try {
-    const res = await fetch("http://127.0.0.1:8000/visualize");
-    const html = await res.text();
-    vizDiv.innerHTML = `<div class="visualization-container">${html}</div>`;
+    // SVG is built server-side without matplotlib, so it is much cheaper than the PNG
+    const res = await fetch("http://127.0.0.1:8000/visualize?format=svg");
+    const svg = await res.text();
+    vizDiv.innerHTML = `<div class="visualization-container"><h3>📊 Dashboard Charts</h3>${svg}</div>`;
   } catch (error) {
     vizDiv.innerHTML = `<div class="error-container"><p>❌ Visualization failed to load.</p></div>`;
   }
 }
 
 // 📁 Load Additional Info (Discounts + Recommendations + Dashboard)
-// 📁 Load Additional Info (Discounts + Recommendations + Dashboard)
-async function loadAdditionalInfo(data) {
+async function loadAdditionalInfo(assessment) {
   try {
-    const [discountRes, recommendRes, dashboardRes] = await Promise.all([
-      fetch("http://127.0.0.1:8000/get-discount", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ Product_Category: data.Product_Category }),
-      }),
-      fetch("http://127.0.0.1:8000/recommend", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-          Product_Category: data.Product_Category,
-          Product_Size: data.Product_Size,
-        }),
-      }),
-      fetch("http://127.0.0.1:8000/dashboard-data"),
-    ]);
-
-    const discount = await discountRes.json();
-    const recommend = await recommendRes.json();
+    const dashboardRes = await fetch("http://127.0.0.1:8000/dashboard-data");
+
+    const discount = assessment.discount;
+    const recommend = assessment.recommendation;
     const dashboard = await dashboardRes.json();
 
     infoDiv.innerHTML = `
       <div class="result-container extra-section">
         <h3>🎁 Discount Suggestion</h3>
-        <p><strong>${discount.discount}</strong> - ${discount.message}</p>
+        <p><strong>${discount.discount_percent}%</strong> - ${discount.reason}</p>
 
         <h3>🔄 Recommended Alternatives</h3>
         <p>${recommend.recommended_product || "No alternative found."}</p>
@@ -185,7 +162,7 @@ async function loadAdditionalInfo(data) {
 // 📜 Load Logs
 async function loadLogs() {
   try {
-    const response = await fetch("http://127.0.0.1:8000/view-logs");
+    const response = await fetch("http://127.0.0.1:8000/view-logs?lines=300");
     const data = await response.json();
     const logsArea = document.getElementById("logs-output");
     logsArea.textContent = data.logs || "No logs available.";
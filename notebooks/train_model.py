@@ -6,21 +6,58 @@ from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import accuracy_score, classification_report
 import joblib
 import shap
+import argparse
 import json
 import os
+import shutil
+import sys
+import tempfile
+import time
 
-def load_and_preprocess_data():
+CATEGORICAL_COLS = ['Product_Category', 'Product_Size', 'Customer_Region', 'Customer_Age_Group']
+NUMERIC_COLS = ['Past_Return_Count', 'Product_Rating', 'Delivery_Time_Days']
+TARGET_COL = 'Will_Return'
+
+def peak_memory_mb():
+    """Peak resident memory of this process in MB (None where the platform doesn't report it)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+class StageTimer:
+    """Wall-clock time and peak memory after each pipeline stage"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.stages = []
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages.append((stage, now - self.last, peak_memory_mb()))
+        self.last = now
+
+    def report(self):
+        print("\n⏱️ Training report")
+        for stage, seconds, peak in self.stages:
+            print(f"  {stage:<12} {seconds:8.2f}s   peak memory {peak if peak is not None else 'n/a'} MB")
+        print(f"  {'total':<12} {time.perf_counter() - self.started:8.2f}s")
+
+def load_and_preprocess_data(data_path='smart_returns_dataset.csv'):
     """Load and preprocess the dataset"""
     # Load the dataset
-    df = pd.read_csv('smart_returns_dataset.csv')
+    df = pd.read_csv(data_path)
     
     print(f"Dataset shape: {df.shape}")
     print(f"Columns: {df.columns.tolist()}")
     print(f"\nMissing values:\n{df.isnull().sum()}")
     
     # Handle missing values in categorical columns (replace NaN with 'Unknown')
-    categorical_cols = ['Product_Category', 'Product_Size', 'Customer_Region', 'Customer_Age_Group']
-    for col in categorical_cols:
+    for col in CATEGORICAL_COLS:
         df[col] = df[col].fillna('Unknown')
     
     return df
@@ -36,21 +73,29 @@ def prepare_features_and_target(df):
     y_encoded = label_encoder.fit_transform(y)
     
     # One-hot encode categorical features
-    categorical_cols = ['Product_Category', 'Product_Size', 'Customer_Region', 'Customer_Age_Group']
-    X_encoded = pd.get_dummies(X, columns=categorical_cols)
+    X_encoded = pd.get_dummies(X, columns=CATEGORICAL_COLS)
     
     print(f"Feature columns after encoding: {X_encoded.columns.tolist()}")
     print(f"Encoded dataset shape: {X_encoded.shape}")
     
     return X_encoded, y_encoded, label_encoder, X_encoded.columns.tolist()
 
-def train_model(X, y):
+def new_model(n_jobs=-1):
+    """Random Forest with the project's hyperparameters, fitted on n_jobs cores"""
+    return RandomForestClassifier(n_estimators=100, random_state=42, max_depth=10, n_jobs=n_jobs)
+
+def serving_copy(model):
+    """Reset n_jobs before saving: the API predicts a few rows per call and parallelises across requests"""
+    model.n_jobs = None
+    return model
+
+def train_model(X, y, n_jobs=-1):
     """Train the Random Forest model"""
     # Split the data
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
     
     # Train Random Forest
-    model = RandomForestClassifier(n_estimators=100, random_state=42, max_depth=10)
+    model = new_model(n_jobs)
     model.fit(X_train, y_train)
     
     # Make predictions
@@ -78,10 +123,9 @@ def create_shap_explainer(model, X_train):
     
     return explainer
 
-def save_model_artifacts(model, explainer, label_encoder, feature_columns):
+def save_model_artifacts(model, explainer, label_encoder, feature_columns, model_dir='model'):
     """Save all model artifacts"""
     # Create model directory
-    model_dir = 'model'
     os.makedirs(model_dir, exist_ok=True)
     
     # Save model
@@ -101,27 +145,193 @@ def save_model_artifacts(model, explainer, label_encoder, feature_columns):
         json.dump(feature_columns, f)
     print("✅ Feature columns saved")
 
-def main():
-    """Main training pipeline"""
-    print("🚀 Starting Smart Returns Model Training...")
-    
+def _fill_unknown(chunk):
+    """Same missing-value rule as load_and_preprocess_data, on categorical columns"""
+    for col in CATEGORICAL_COLS:
+        if chunk[col].isna().any():
+            if 'Unknown' not in chunk[col].cat.categories:
+                chunk[col] = chunk[col].cat.add_categories('Unknown')
+            chunk[col] = chunk[col].fillna('Unknown')
+    return chunk
+
+def read_chunks(data_path, chunksize):
+    """Stream the CSV with categorical and float32 dtypes instead of object/float64 columns.
+
+    Rows without a target are dropped, since they can't be labelled."""
+    dtypes = {col: 'category' for col in CATEGORICAL_COLS}
+    dtypes.update({col: 'float32' for col in NUMERIC_COLS})
+    dtypes[TARGET_COL] = 'category'
+    usecols = CATEGORICAL_COLS + NUMERIC_COLS + [TARGET_COL]
+    for chunk in pd.read_csv(data_path, usecols=usecols, dtype=dtypes, chunksize=chunksize):
+        yield _fill_unknown(chunk[chunk[TARGET_COL].notna()])
+
+def _test_mask(rng, labels, test_size):
+    # Stratified like train_test_split(stratify=y), within each chunk: test_size of every class is held out.
+    # Drawn per chunk from a freshly seeded generator, so both passes see the same split
+    is_test = np.zeros(len(labels), dtype=bool)
+    for label in np.unique(labels):
+        rows = np.flatnonzero(labels == label)
+        is_test[rng.choice(rows, size=int(round(len(rows) * test_size)), replace=False)] = True
+    return is_test
+
+def scan_dataset(data_path, chunksize, test_size=0.2, seed=42):
+    """First pass: row counts, category levels and target classes"""
+    levels = {col: set() for col in CATEGORICAL_COLS}
+    labels = set()
+    n_train = n_test = 0
+    rng = np.random.default_rng(seed)
+    for chunk in read_chunks(data_path, chunksize):
+        for col in CATEGORICAL_COLS:
+            levels[col].update(chunk[col].cat.categories)
+        labels.update(chunk[TARGET_COL].dropna().unique())
+        is_test = _test_mask(rng, chunk[TARGET_COL].astype(str).to_numpy(), test_size)
+        n_test += int(is_test.sum())
+        n_train += len(chunk) - int(is_test.sum())
+
+    # pd.get_dummies orders dummy columns by sorted category, after the numeric columns
+    levels = {col: sorted(values) for col, values in levels.items()}
+    feature_columns = list(NUMERIC_COLS)
+    for col in CATEGORICAL_COLS:
+        feature_columns += [f"{col}_{level}" for level in levels[col]]
+
+    label_encoder = LabelEncoder()
+    label_encoder.fit(sorted(labels))
+    print(f"Dataset rows: {n_train + n_test} (train {n_train}, test {n_test})")
+    print(f"Feature columns after encoding: {feature_columns}")
+    return levels, feature_columns, label_encoder, n_train, n_test
+
+def encode_to_memmap(data_path, chunksize, levels, feature_columns, label_encoder, n_train, n_test,
+                     workdir, test_size=0.2, seed=42):
+    """Second pass: one-hot encode each chunk straight into float32 memory-mapped train/test matrices"""
+    n_features = len(feature_columns)
+    X_train = np.lib.format.open_memmap(os.path.join(workdir, 'X_train.npy'), mode='w+', dtype=np.float32,
+                                        shape=(n_train, n_features))
+    X_test = np.lib.format.open_memmap(os.path.join(workdir, 'X_test.npy'), mode='w+', dtype=np.float32,
+                                       shape=(n_test, n_features))
+    y_train = np.empty(n_train, dtype=np.int8)
+    y_test = np.empty(n_test, dtype=np.int8)
+
+    offsets = {}
+    offset = len(NUMERIC_COLS)
+    for col in CATEGORICAL_COLS:
+        offsets[col] = offset
+        offset += len(levels[col])
+
+    rng = np.random.default_rng(seed)
+    train_pos = test_pos = 0
+    for chunk in read_chunks(data_path, chunksize):
+        block = np.zeros((len(chunk), n_features), dtype=np.float32)
+        block[:, :len(NUMERIC_COLS)] = chunk[NUMERIC_COLS].to_numpy(dtype=np.float32)
+        rows = np.arange(len(chunk))
+        for col in CATEGORICAL_COLS:
+            codes = pd.Categorical(chunk[col], categories=levels[col]).codes
+            block[rows, offsets[col] + codes] = 1.0
+        targets = chunk[TARGET_COL].astype(str).to_numpy()
+        labels = label_encoder.transform(targets).astype(np.int8)
+
+        is_test = _test_mask(rng, targets, test_size)
+        n = int((~is_test).sum())
+        X_train[train_pos:train_pos + n] = block[~is_test]
+        y_train[train_pos:train_pos + n] = labels[~is_test]
+        train_pos += n
+        n = int(is_test.sum())
+        X_test[test_pos:test_pos + n] = block[is_test]
+        y_test[test_pos:test_pos + n] = labels[is_test]
+        test_pos += n
+
+    X_train.flush()
+    X_test.flush()
+    print(f"Encoded train matrix: {X_train.shape} ({X_train.nbytes / 1e6:.1f} MB on disk)")
+    return X_train, X_test, y_train, y_test
+
+def evaluate_chunked(model, X_test, y_test, chunksize):
+    """Accuracy and classification report, predicting the test matrix one slice at a time"""
+    y_pred = np.concatenate([model.predict(X_test[start:start + chunksize])
+                             for start in range(0, len(X_test), chunksize)]) if len(X_test) else np.array([])
+    accuracy = accuracy_score(y_test, y_pred)
+    print(f"\nModel Accuracy: {accuracy:.3f}")
+    print(f"\nClassification Report:\n{classification_report(y_test, y_pred)}")
+
+def train_chunked(args, timer):
+    """Out-of-core pipeline: two passes over the CSV, training on memory-mapped matrices"""
+    levels, feature_columns, label_encoder, n_train, n_test = scan_dataset(args.data, args.chunksize)
+    timer.mark('scan')
+
+    workdir = tempfile.mkdtemp(prefix='train_', dir=args.workdir)
+    X_train = X_test = None
+    try:
+        X_train, X_test, y_train, y_test = encode_to_memmap(
+            args.data, args.chunksize, levels, feature_columns, label_encoder, n_train, n_test, workdir
+        )
+        timer.mark('encode')
+
+        model = new_model(args.n_jobs)
+        model.fit(X_train, y_train)
+        timer.mark('fit')
+
+        evaluate_chunked(model, X_test, y_test, args.chunksize)
+        timer.mark('evaluate')
+        # Fitted on a plain array; record the column names like a DataFrame fit would
+        model.feature_names_in_ = np.array(feature_columns, dtype=object)
+
+        rng = np.random.default_rng(42)
+        sample = np.sort(rng.choice(len(X_train), size=min(100, len(X_train)), replace=False))
+        explainer = create_shap_explainer(model, pd.DataFrame(X_train[sample], columns=feature_columns))
+        timer.mark('shap')
+    finally:
+        # Drop the memmaps before removing their files (required on Windows)
+        X_train = X_test = None
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return serving_copy(model), explainer, label_encoder, feature_columns
+
+def train_in_memory(args, timer):
+    """Original pipeline: whole dataset in pandas"""
     # Load and preprocess data
-    df = load_and_preprocess_data()
+    df = load_and_preprocess_data(args.data)
     
     # Prepare features and target
     X_encoded, y_encoded, label_encoder, feature_columns = prepare_features_and_target(df)
+    timer.mark('encode')
     
     # Train model
-    model, X_train, X_test, y_test = train_model(X_encoded, y_encoded)
+    model, X_train, X_test, y_test = train_model(X_encoded, y_encoded, args.n_jobs)
+    timer.mark('fit')
     
     # Create SHAP explainer
     explainer = create_shap_explainer(model, X_train)
+    timer.mark('shap')
+    return serving_copy(model), explainer, label_encoder, feature_columns
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the Smart Returns model")
+    parser.add_argument('--data', default='smart_returns_dataset.csv', help="training CSV")
+    parser.add_argument('--model-dir', default='model', help="where the artifacts are written")
+    parser.add_argument('--chunksize', type=int, default=0,
+                        help="rows per chunk; enables the out-of-core pipeline for datasets that don't fit in memory")
+    parser.add_argument('--workdir', default=None, help="directory for the memory-mapped matrices (default: system temp)")
+    parser.add_argument('--n-jobs', type=int, default=-1, help="cores used to fit the forest (-1 = all)")
+    return parser.parse_args()
+
+def main():
+    """Main training pipeline"""
+    args = parse_args()
+    print("🚀 Starting Smart Returns Model Training...")
+    timer = StageTimer()
+    
+    if args.chunksize > 0:
+        print(f"📦 Out-of-core mode: {args.chunksize} rows per chunk")
+        model, explainer, label_encoder, feature_columns = train_chunked(args, timer)
+    else:
+        model, explainer, label_encoder, feature_columns = train_in_memory(args, timer)
     
     # Save all artifacts
-    save_model_artifacts(model, explainer, label_encoder, feature_columns)
+    save_model_artifacts(model, explainer, label_encoder, feature_columns, args.model_dir)
+    timer.mark('save')
+    timer.report()
     
     print("\n🎉 Training completed successfully!")
-    print("📁 Model artifacts saved in 'model/' directory")
+    print(f"📁 Model artifacts saved in '{args.model_dir}/' directory")
     print("\n🔧 Next steps:")
     print("1. Navigate to backend/ directory")
     print("2. Run: pip install -r requirements.txt")